@@ -0,0 +1,34 @@
+"""add sharded collected_counters
+
+Revision ID: add_collected_counters
+Revises: add_users_referrer_index
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_collected_counters'
+down_revision = 'add_users_referrer_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'collected_counters',
+        sa.Column('shard', sa.Integer, primary_key=True),
+        sa.Column('tons_total', sa.Numeric(14, 2), nullable=False, server_default='0'),
+    )
+    
+    # Backfill: current total goes to shard 0
+    op.execute(
+        "INSERT INTO collected_counters (shard, tons_total) "
+        "SELECT 0, ROUND(COALESCE(SUM(tons_amount), 0), 2) FROM donations"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('collected_counters')
@@ -0,0 +1,65 @@
+"""add hourly and daily donation rollups
+
+Revision ID: add_donation_rollups
+Revises: add_referral_closure
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+import pytz
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_donation_rollups'
+down_revision = 'add_referral_closure'
+branch_labels = None
+depends_on = None
+
+# Same as the default settings.timezone / settings.rollup_hour_retention_days
+TIMEZONE = "Europe/Berlin"
+BACKFILL_DAYS = 35
+
+
+def upgrade() -> None:
+    hour_totals = op.create_table(
+        'user_hour_totals',
+        sa.Column('hour', sa.DateTime, primary_key=True),
+        sa.Column('tg_id', sa.BigInteger, sa.ForeignKey('users.tg_id'), primary_key=True),
+        sa.Column('tons', sa.Numeric(12, 2), nullable=False, server_default='0'),
+    )
+    day_totals = op.create_table(
+        'user_day_totals',
+        sa.Column('day', sa.Date, primary_key=True),
+        sa.Column('tg_id', sa.BigInteger, sa.ForeignKey('users.tg_id'), primary_key=True),
+        sa.Column('tons', sa.Numeric(12, 2), nullable=False, server_default='0'),
+    )
+    op.create_index('ix_user_day_totals_rank', 'user_day_totals', ['day', sa.text('tons DESC'), 'tg_id'])
+    
+    # Backfill the recent donations every period can reach (longest: rolling 30 days, current month)
+    tz = pytz.timezone(TIMEZONE)
+    since = datetime.utcnow() - timedelta(days=BACKFILL_DAYS)
+    rows = op.get_bind().execute(
+        sa.text("SELECT tg_id, tons_amount, created_at FROM donations WHERE created_at >= :since"),
+        {"since": since}
+    ).all()
+    hours = defaultdict(Decimal)
+    days = defaultdict(Decimal)
+    for tg_id, tons, created_at in rows:
+        if isinstance(created_at, str):
+            created_at = datetime.fromisoformat(created_at)
+        tons = Decimal(str(tons))
+        hours[(created_at.replace(minute=0, second=0, microsecond=0), tg_id)] += tons
+        days[(created_at.replace(tzinfo=pytz.UTC).astimezone(tz).date(), tg_id)] += tons
+    if hours:
+        op.bulk_insert(hour_totals, [{"hour": h, "tg_id": t, "tons": v} for (h, t), v in hours.items()])
+        op.bulk_insert(day_totals, [{"day": d, "tg_id": t, "tons": v} for (d, t), v in days.items()])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_day_totals_rank', table_name='user_day_totals')
+    op.drop_table('user_day_totals')
+    op.drop_table('user_hour_totals')
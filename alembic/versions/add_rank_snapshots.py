@@ -0,0 +1,35 @@
+"""add rank_snapshots
+
+Revision ID: add_rank_snapshots
+Revises: add_user_trending
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_rank_snapshots'
+down_revision = 'add_user_trending'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'rank_snapshots',
+        sa.Column('id', sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column('board', sa.String(20), nullable=False),
+        sa.Column('week_key', sa.String(10), nullable=True),
+        sa.Column('taken_at', sa.DateTime, nullable=False),
+        sa.Column('users_count', sa.Integer, nullable=False),
+        sa.Column('tg_ids', sa.LargeBinary, nullable=False),
+        sa.Column('ranks', sa.LargeBinary, nullable=False),
+    )
+    op.create_index('ix_rank_snapshots_board_taken_at', 'rank_snapshots', ['board', 'taken_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_rank_snapshots_board_taken_at', table_name='rank_snapshots')
+    op.drop_table('rank_snapshots')
@@ -0,0 +1,77 @@
+"""add referral closure table and network totals
+
+Revision ID: add_referral_closure
+Revises: add_referrer_totals
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_referral_closure'
+down_revision = 'add_referrer_totals'
+branch_labels = None
+depends_on = None
+
+# Same as the default settings.referral_network_depth
+MAX_DEPTH = 10
+
+
+def upgrade() -> None:
+    op.create_table(
+        'referral_closure',
+        sa.Column('ancestor_id', sa.BigInteger, sa.ForeignKey('users.tg_id'), primary_key=True),
+        sa.Column('descendant_id', sa.BigInteger, sa.ForeignKey('users.tg_id'), primary_key=True),
+        sa.Column('depth', sa.Integer, nullable=False),
+    )
+    op.create_index('ix_referral_closure_descendant_id', 'referral_closure', ['descendant_id'])
+    op.create_table(
+        'referral_level_totals',
+        sa.Column('ancestor_id', sa.BigInteger, sa.ForeignKey('users.tg_id'), primary_key=True),
+        sa.Column('depth', sa.Integer, primary_key=True),
+        sa.Column('members', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('tons_total', sa.Numeric(14, 2), nullable=False, server_default='0'),
+    )
+    op.create_table(
+        'referral_network_totals',
+        sa.Column('ancestor_id', sa.BigInteger, sa.ForeignKey('users.tg_id'), primary_key=True),
+        sa.Column('network_size', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('network_tons', sa.Numeric(14, 2), nullable=False, server_default='0'),
+    )
+    op.create_index('ix_referral_network_size_rank', 'referral_network_totals', [sa.text('network_size DESC'), 'ancestor_id'])
+    op.create_index('ix_referral_network_tons_rank', 'referral_network_totals', [sa.text('network_tons DESC'), 'ancestor_id'])
+    
+    # Backfill: walk users.referrer_id once, then aggregate
+    op.execute(
+        "WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS ("
+        "  SELECT referrer_id, tg_id, 1 FROM users WHERE referrer_id IS NOT NULL"
+        "  UNION ALL"
+        "  SELECT u.referrer_id, t.descendant_id, t.depth + 1"
+        "  FROM tree t JOIN users u ON u.tg_id = t.ancestor_id"
+        f"  WHERE u.referrer_id IS NOT NULL AND t.depth < {MAX_DEPTH}"
+        ") "
+        "INSERT INTO referral_closure (ancestor_id, descendant_id, depth) "
+        "SELECT ancestor_id, descendant_id, depth FROM tree"
+    )
+    op.execute(
+        "INSERT INTO referral_level_totals (ancestor_id, depth, members, tons_total) "
+        "SELECT c.ancestor_id, c.depth, COUNT(*), ROUND(COALESCE(SUM(t.tons_all_time), 0), 2) "
+        "FROM referral_closure c LEFT JOIN user_totals t ON t.tg_id = c.descendant_id "
+        "GROUP BY c.ancestor_id, c.depth"
+    )
+    op.execute(
+        "INSERT INTO referral_network_totals (ancestor_id, network_size, network_tons) "
+        "SELECT ancestor_id, SUM(members), ROUND(SUM(tons_total), 2) "
+        "FROM referral_level_totals GROUP BY ancestor_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_referral_network_tons_rank', table_name='referral_network_totals')
+    op.drop_index('ix_referral_network_size_rank', table_name='referral_network_totals')
+    op.drop_table('referral_network_totals')
+    op.drop_table('referral_level_totals')
+    op.drop_index('ix_referral_closure_descendant_id', table_name='referral_closure')
+    op.drop_table('referral_closure')
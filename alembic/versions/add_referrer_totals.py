@@ -0,0 +1,40 @@
+"""add referrer_totals projection
+
+Revision ID: add_referrer_totals
+Revises: add_week_snapshots
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_referrer_totals'
+down_revision = 'add_week_snapshots'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'referrer_totals',
+        sa.Column('referrer_id', sa.BigInteger, sa.ForeignKey('users.tg_id'), primary_key=True),
+        sa.Column('referrals_count', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('referrals_tons_total', sa.Numeric(14, 2), nullable=False, server_default='0'),
+    )
+    op.create_index('ix_referrer_totals_rank', 'referrer_totals', [sa.text('referrals_tons_total DESC'), 'referrer_id'])
+    
+    # Backfill from users.referrer_id and user_totals
+    op.execute(
+        "INSERT INTO referrer_totals (referrer_id, referrals_count, referrals_tons_total) "
+        "SELECT u.referrer_id, COUNT(*), ROUND(COALESCE(SUM(t.tons_all_time), 0), 2) "
+        "FROM users u LEFT JOIN user_totals t ON t.tg_id = u.tg_id "
+        "WHERE u.referrer_id IS NOT NULL "
+        "GROUP BY u.referrer_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_referrer_totals_rank', table_name='referrer_totals')
+    op.drop_table('referrer_totals')
@@ -0,0 +1,51 @@
+"""add user_totals and user_week_totals projections
+
+Revision ID: add_user_totals
+Revises: add_ton_payments
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_user_totals'
+down_revision = 'add_ton_payments'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_totals',
+        sa.Column('tg_id', sa.BigInteger, sa.ForeignKey('users.tg_id'), primary_key=True),
+        sa.Column('tons_all_time', sa.Numeric(12, 2), nullable=False, server_default='0'),
+        sa.Column('last_donation_at', sa.DateTime, nullable=True),
+    )
+    op.create_index('ix_user_totals_rank', 'user_totals', [sa.text('tons_all_time DESC'), 'tg_id'])
+    
+    op.create_table(
+        'user_week_totals',
+        sa.Column('week_key', sa.String(10), primary_key=True),
+        sa.Column('tg_id', sa.BigInteger, sa.ForeignKey('users.tg_id'), primary_key=True),
+        sa.Column('tons', sa.Numeric(12, 2), nullable=False, server_default='0'),
+    )
+    op.create_index('ix_user_week_totals_rank', 'user_week_totals', ['week_key', sa.text('tons DESC'), 'tg_id'])
+    
+    # Backfill from existing donations
+    op.execute(
+        "INSERT INTO user_totals (tg_id, tons_all_time, last_donation_at) "
+        "SELECT tg_id, ROUND(SUM(tons_amount), 2), MAX(created_at) FROM donations GROUP BY tg_id"
+    )
+    op.execute(
+        "INSERT INTO user_week_totals (week_key, tg_id, tons) "
+        "SELECT week_key, tg_id, ROUND(SUM(tons_amount), 2) FROM donations GROUP BY week_key, tg_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_week_totals_rank', 'user_week_totals')
+    op.drop_table('user_week_totals')
+    op.drop_index('ix_user_totals_rank', 'user_totals')
+    op.drop_table('user_totals')
@@ -0,0 +1,57 @@
+"""add user_trending
+
+Revision ID: add_user_trending
+Revises: add_donation_rollups
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime
+import math
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_user_trending'
+down_revision = 'add_donation_rollups'
+branch_labels = None
+depends_on = None
+
+# Same as trending_service.EPOCH and the default settings.trending_half_life_hours
+EPOCH = datetime(2026, 1, 1)
+HALF_LIFE_HOURS = 24.0
+
+
+def upgrade() -> None:
+    trending = op.create_table(
+        'user_trending',
+        sa.Column('tg_id', sa.BigInteger, sa.ForeignKey('users.tg_id'), primary_key=True),
+        sa.Column('log_score', sa.Float, nullable=False),
+        sa.Column('updated_at', sa.DateTime, nullable=False),
+    )
+    op.create_index('ix_user_trending_rank', 'user_trending', [sa.text('log_score DESC'), 'tg_id'])
+    
+    # Backfill: log2 of the decayed sum of each user's donations
+    scores = {}
+    rows = op.get_bind().execute(
+        sa.text("SELECT tg_id, tons_amount, created_at FROM donations WHERE tons_amount > 0")
+    )
+    for tg_id, tons, created_at in rows:
+        if isinstance(created_at, str):
+            created_at = datetime.fromisoformat(created_at)
+        term = math.log2(float(tons)) + (created_at - EPOCH).total_seconds() / (HALF_LIFE_HOURS * 3600)
+        log_score, updated_at = scores.get(tg_id, (None, created_at))
+        if log_score is not None:
+            high, low = max(log_score, term), min(log_score, term)
+            term = high + math.log2(1 + 2 ** (low - high))
+        scores[tg_id] = (term, max(updated_at, created_at))
+    if scores:
+        op.bulk_insert(trending, [
+            {"tg_id": tg_id, "log_score": log_score, "updated_at": updated_at}
+            for tg_id, (log_score, updated_at) in scores.items()
+        ])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_trending_rank', table_name='user_trending')
+    op.drop_table('user_trending')
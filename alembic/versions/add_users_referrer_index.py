@@ -0,0 +1,24 @@
+"""add index on users.referrer_id
+
+Revision ID: add_users_referrer_index
+Revises: add_user_totals
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_users_referrer_index'
+down_revision = 'add_user_totals'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Referral stats look users up by referrer
+    op.create_index('ix_users_referrer_id', 'users', ['referrer_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_referrer_id', 'users')
@@ -0,0 +1,45 @@
+"""add week_archives and week_snapshots
+
+Revision ID: add_week_snapshots
+Revises: add_collected_counters
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_week_snapshots'
+down_revision = 'add_collected_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'week_archives',
+        sa.Column('week_key', sa.String(10), primary_key=True),
+        sa.Column('participants', sa.Integer, nullable=False),
+        sa.Column('frozen_at', sa.DateTime, nullable=False),
+    )
+    op.create_table(
+        'week_snapshots',
+        sa.Column('week_key', sa.String(10), primary_key=True),
+        sa.Column('rank', sa.Integer, primary_key=True),
+        sa.Column('tg_id', sa.BigInteger, nullable=False),
+        sa.Column('tons_week', sa.Numeric(12, 2), nullable=False),
+        sa.Column('username', sa.String, nullable=True),
+        sa.Column('first_name', sa.String, nullable=True),
+        sa.Column('display_name', sa.String(50), nullable=True),
+        sa.Column('photo_url', sa.String, nullable=True),
+        sa.Column('custom_title', sa.String(50), nullable=True),
+        sa.Column('custom_text', sa.String(200), nullable=True),
+        sa.Column('custom_link', sa.String(500), nullable=True),
+    )
+    # Past weeks are frozen by the week close task on first run
+
+
+def downgrade() -> None:
+    op.drop_table('week_snapshots')
+    op.drop_table('week_archives')
@@ -0,0 +1,48 @@
+from fastapi import Header, HTTPException, Request
+from typing import NamedTuple, Optional
+from backend.telegram_auth import validate_telegram_init_data
+
+
+class Principal(NamedTuple):
+    """Telegram user authenticated by the request's initData"""
+    tg_id: int
+    init_data: str
+    username: Optional[str] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    language_code: Optional[str] = None
+    is_premium: Optional[bool] = None
+    photo_url: Optional[str] = None
+
+
+def authenticate(request: Request, init_data: Optional[str]) -> Principal:
+    """
+    Validate initData once per request; the result is kept on request.state.
+    Raises 401 if initData is missing or invalid.
+    """
+    principal = getattr(request.state, "principal", None)
+    if principal is not None:
+        return principal
+    
+    if not init_data:
+        raise HTTPException(status_code=401, detail="Missing X-Init-Data header")
+    
+    user_data = validate_telegram_init_data(init_data)
+    if not user_data or not user_data.get("tg_id"):
+        raise HTTPException(status_code=401, detail="Invalid initData")
+    
+    principal = Principal(init_data=init_data, **user_data)
+    request.state.principal = principal
+    return principal
+
+
+async def get_principal(
+    request: Request,
+    x_init_data: Optional[str] = Header(None, alias="X-Init-Data")
+) -> Principal:
+    """
+    Auth dependency for all API routes.
+    Declare it before get_db so unauthenticated requests are rejected
+    before a database session is opened.
+    """
+    return authenticate(request, x_init_data)
@@ -28,9 +28,19 @@ async def start_command_handler(message: Message):
     """Handle /start command - register user and send welcome message"""
     user = message.from_user
     
+    # Check for referral code in command arguments (ref_<id> format)
+    ref_code = None
+    if message.text and len(message.text.split()) > 1:
+        start_param = message.text.split()[1]
+        if start_param.startswith('ref_'):
+            try:
+                ref_code = int(start_param.replace('ref_', ''))
+            except ValueError:
+                pass
+    
     async with AsyncSessionLocal() as session:
         try:
-            # Register or update user
+            # Register or update user; a new user is attached to ref_code if that user exists
             db_user, is_new = await user_service.get_or_create_user(
                 session=session,
                 tg_id=user.id,
@@ -39,32 +49,10 @@ async def start_command_handler(message: Message):
                 last_name=user.last_name,
                 language_code=user.language_code,
                 is_premium=getattr(user, 'is_premium', None),
-                photo_url=None  # Photo URL not available from message.from_user
+                photo_url=None,  # Photo URL not available from message.from_user
+                ref_code=ref_code
             )
             
-            # Check for referral code in command arguments
-            referrer_id = None
-            if message.text and len(message.text.split()) > 1:
-                ref_code = message.text.split()[1]
-                # Handle ref_<id> format
-                if ref_code.startswith('ref_'):
-                    try:
-                        referrer_id = int(ref_code.replace('ref_', ''))
-                        # Only set if user is new and referrer exists
-                        if is_new and referrer_id != user.id:
-                            ref_user, _ = await user_service.get_or_create_user(
-                                session=session,
-                                tg_id=referrer_id
-                            )
-                            if ref_user:
-                                # Update the newly created user with referrer
-                                await session.refresh(db_user)
-                                db_user.referrer_id = referrer_id
-                                await session.commit()
-                                logger.info(f"User {user.id} attached to referrer {referrer_id}")
-                    except (ValueError, AttributeError):
-                        pass
-            
             # Send welcome message
             welcome_text = f"👋 Привет, {user.first_name or user.username or 'друг'}!\n\n"
             
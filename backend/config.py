@@ -26,8 +26,21 @@ class Settings(BaseSettings):
     preset_1_stars: int = 100
     preset_2_stars: int = 50
     preset_3_stars: int = 25
-    leaderboard_limit: int = 10000  # Show all places (no practical limit)
+    leaderboard_limit: int = 10000  # Max page size for leaderboard endpoints
+    leaderboard_page_size: int = 100  # Default page size (use next_cursor for more)
+    leaderboard_cache_ttl_seconds: int = 30  # Max age of cached responses (writes invalidate earlier)
+    profile_cache_size: int = 100000  # Leaderboard profiles kept in memory
+    profile_cache_ttl_seconds: int = 300  # Max age of a cached profile (updates via the API invalidate earlier)
     timezone: str = "Europe/Berlin"
+    trending_half_life_hours: float = 24.0  # A donation's weight on the trending board halves this often
+    rollup_hour_retention_days: int = 35  # Hourly buckets kept for rolling windows (day buckets are kept)
+    rank_snapshot_hours: int = 24  # How often all-time and weekly ranks are recorded for rank history
+    rank_history_cache_mb: int = 256  # Memory for cached rank snapshot blobs (~12 bytes per ranked user each)
+    referral_network_depth: int = 10  # Levels of the referral tree counted in network totals
+    user_touch_flush_seconds: int = 5  # How often buffered last_seen/profile refreshes are written
+    collected_counter_shards: int = 16  # Rows the total-collected counter is spread over
+    ranking_reconcile_minutes: int = 5  # How often the all-time ranking index is diffed against the database
+    collected_reconcile_minutes: int = 60  # How often the counter is checked against SUM(donations)
     
     # TON Payments
     ton_wallet_address: str = ""  # Our receiving TON wallet address
@@ -38,6 +51,9 @@ class Settings(BaseSettings):
     
     # Security
     secret_key: str = "your_secret_key_here"
+    init_data_max_age_seconds: int = 0  # Reject initData with an older auth_date (0 = no limit)
+    init_data_cache_size: int = 10000  # Verified initData strings kept in memory
+    init_data_cache_ttl_seconds: int = 600  # Max age of a cached verification
     
     class Config:
         env_file = ".env"
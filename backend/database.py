@@ -1,5 +1,6 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.dialects import postgresql, sqlite
 from backend.config import settings
 
 engine = create_async_engine(
@@ -27,3 +28,10 @@ async def get_db():
         finally:
             await session.close()
 
+
+
+def dialect_insert(session: AsyncSession, table):
+    """INSERT construct of the session's dialect (supports on_conflict_do_update)"""
+    if session.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
@@ -6,6 +6,15 @@ from backend.routers import leaderboard, user, payments, webhook, tasks
 from backend.routers import ton
 from backend.database import engine, Base, async_session_maker
 from backend.services.ton_service import check_ton_transactions, expire_old_payments
+from backend.services.ranking_index import all_time_index
+from backend.services.leaderboard_cache import leaderboard_cache
+from backend.services.totals_service import reconcile_collected
+from backend.services.week_archive_service import freeze_closed_weeks
+from backend.services.rollup_service import prune_hour_totals
+from backend.services.rank_history_service import take_snapshots_if_due
+from backend.services.distribution_sketch import distribution
+from backend.services.user_touch_buffer import user_touches
+from backend.services.known_users import known_users
 from backend.config import settings
 import logging
 
@@ -32,6 +41,78 @@ async def ton_monitor_task():
         await asyncio.sleep(30)
 
 
+# Background task for checking the total-collected counter against donations
+async def collected_reconcile_task():
+    """Report drift between the sharded counter and SUM(donations)"""
+    while True:
+        await asyncio.sleep(settings.collected_reconcile_minutes * 60)
+        try:
+            async with async_session_maker() as session:
+                drift = await reconcile_collected(session)
+            if drift != 0:
+                logger.warning(f"Total collected counter drift: {drift} (counter - SUM(donations))")
+        except Exception as e:
+            logger.error(f"Error in collected reconcile: {e}")
+
+
+# Background task for picking up ranking changes made outside this process
+async def ranking_reconcile_task():
+    """Diff the all-time ranking index against users/user_totals"""
+    while True:
+        await asyncio.sleep(settings.ranking_reconcile_minutes * 60)
+        try:
+            async with async_session_maker() as session:
+                changes = await all_time_index.reconcile(session)
+            if changes:
+                leaderboard_cache.bump()
+        except Exception as e:
+            logger.error(f"Error in ranking reconcile: {e}")
+
+
+# Background task for freezing ended weeks into week_snapshots
+async def week_close_task():
+    """Freeze final standings of every ended week"""
+    while True:
+        try:
+            async with async_session_maker() as session:
+                await freeze_closed_weeks(session)
+        except Exception as e:
+            logger.error(f"Error in week close: {e}")
+        
+        # Check every 5 minutes
+        await asyncio.sleep(300)
+
+
+# Background task for dropping hour buckets no rolling window needs anymore
+async def rollup_prune_task():
+    """Prune old hourly donation buckets"""
+    while True:
+        try:
+            async with async_session_maker() as session:
+                pruned = await prune_hour_totals(session)
+            if pruned:
+                logger.info(f"Pruned {pruned} hourly donation buckets")
+        except Exception as e:
+            logger.error(f"Error in rollup prune: {e}")
+        
+        # Check every hour
+        await asyncio.sleep(3600)
+
+
+# Background task for recording ranks for rank-history charts
+async def rank_snapshot_task():
+    """Snapshot all-time and weekly ranks every settings.rank_snapshot_hours"""
+    while True:
+        try:
+            async with async_session_maker() as session:
+                await take_snapshots_if_due(session)
+        except Exception as e:
+            logger.error(f"Error in rank snapshot: {e}")
+        
+        # Check every 10 minutes
+        await asyncio.sleep(600)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler"""
@@ -40,19 +121,33 @@ async def lifespan(app: FastAPI):
         await conn.run_sync(Base.metadata.create_all)
     logger.info("Database initialized")
     
+    # Build in-memory all-time ranking, distribution sketches and known-user set
+    async with async_session_maker() as session:
+        await all_time_index.load(session)
+        await distribution.load(session)
+        await known_users.load(session)
+    
     # Start TON monitor task
     ton_task = asyncio.create_task(ton_monitor_task())
     logger.info("TON monitor task started")
     
+    reconcile_task = asyncio.create_task(collected_reconcile_task())
+    ranking_task = asyncio.create_task(ranking_reconcile_task())
+    week_task = asyncio.create_task(week_close_task())
+    prune_task = asyncio.create_task(rollup_prune_task())
+    snapshot_task = asyncio.create_task(rank_snapshot_task())
+    
     yield
     
     # Shutdown
-    ton_task.cancel()
-    try:
-        await ton_task
-    except asyncio.CancelledError:
-        pass
-    logger.info("TON monitor task stopped")
+    for task in (ton_task, reconcile_task, ranking_task, week_task, prune_task, snapshot_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    await user_touches.close()
+    logger.info("Background tasks stopped")
 
 
 app = FastAPI(title="Telegram Leaderboard API", version="1.0.0", lifespan=lifespan)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, String, Boolean, DateTime, ForeignKey, Integer, Numeric, Text, JSON, UniqueConstraint
+from sqlalchemy import Column, BigInteger, String, Boolean, Date, DateTime, Float, ForeignKey, Integer, LargeBinary, Numeric, Text, JSON, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID as PostgresUUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import TypeDecorator, CHAR
@@ -59,7 +59,7 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     last_seen_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    referrer_id = Column(BigInteger, ForeignKey("users.tg_id"), nullable=True)
+    referrer_id = Column(BigInteger, ForeignKey("users.tg_id"), nullable=True, index=True)
     is_blocked = Column(Boolean, default=False, nullable=False)
     
     # Relationships
@@ -84,6 +84,160 @@ class Donation(Base):
     payment = relationship("Payment", back_populates="donation")
 
 
+class UserTotal(Base):
+    """Per-user all-time donation total, maintained on every Donation insert"""
+    __tablename__ = "user_totals"
+    
+    tg_id = Column(BigInteger, ForeignKey("users.tg_id"), primary_key=True)
+    tons_all_time = Column(Numeric(12, 2), default=0, nullable=False)
+    last_donation_at = Column(DateTime, nullable=True)
+
+
+Index("ix_user_totals_rank", UserTotal.tons_all_time.desc(), UserTotal.tg_id)
+
+
+class UserWeekTotal(Base):
+    """Per-user weekly donation total, maintained on every Donation insert"""
+    __tablename__ = "user_week_totals"
+    
+    week_key = Column(String(10), primary_key=True)  # Format: "2026-W03"
+    tg_id = Column(BigInteger, ForeignKey("users.tg_id"), primary_key=True)
+    tons = Column(Numeric(12, 2), default=0, nullable=False)
+
+
+Index("ix_user_week_totals_rank", UserWeekTotal.week_key, UserWeekTotal.tons.desc(), UserWeekTotal.tg_id)
+
+
+class UserHourTotal(Base):
+    """Per-user donation sum per UTC hour, maintained on every Donation insert"""
+    __tablename__ = "user_hour_totals"
+    
+    hour = Column(DateTime, primary_key=True)  # UTC, truncated to the hour
+    tg_id = Column(BigInteger, ForeignKey("users.tg_id"), primary_key=True)
+    tons = Column(Numeric(12, 2), default=0, nullable=False)
+
+
+class UserDayTotal(Base):
+    """Per-user donation sum per local (settings.timezone) day, maintained on every Donation insert"""
+    __tablename__ = "user_day_totals"
+    
+    day = Column(Date, primary_key=True)
+    tg_id = Column(BigInteger, ForeignKey("users.tg_id"), primary_key=True)
+    tons = Column(Numeric(12, 2), default=0, nullable=False)
+
+
+Index("ix_user_day_totals_rank", UserDayTotal.day, UserDayTotal.tons.desc(), UserDayTotal.tg_id)
+
+
+class UserTrending(Base):
+    """Per-user exponentially decayed donation score, stored as log2 relative to a fixed epoch"""
+    __tablename__ = "user_trending"
+    
+    tg_id = Column(BigInteger, ForeignKey("users.tg_id"), primary_key=True)
+    log_score = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+Index("ix_user_trending_rank", UserTrending.log_score.desc(), UserTrending.tg_id)
+
+
+class ReferrerTotal(Base):
+    """Per-referrer count of invited users and their all-time donation sum"""
+    __tablename__ = "referrer_totals"
+    
+    referrer_id = Column(BigInteger, ForeignKey("users.tg_id"), primary_key=True)
+    referrals_count = Column(Integer, default=0, nullable=False)
+    referrals_tons_total = Column(Numeric(14, 2), default=0, nullable=False)
+
+
+Index("ix_referrer_totals_rank", ReferrerTotal.referrals_tons_total.desc(), ReferrerTotal.referrer_id)
+
+
+class ReferralClosure(Base):
+    """Referral tree as a closure table: one row per (ancestor, descendant) pair"""
+    __tablename__ = "referral_closure"
+    
+    ancestor_id = Column(BigInteger, ForeignKey("users.tg_id"), primary_key=True)
+    descendant_id = Column(BigInteger, ForeignKey("users.tg_id"), primary_key=True, index=True)
+    depth = Column(Integer, nullable=False)  # 1 = direct referral
+
+
+class ReferralLevelTotal(Base):
+    """Per-ancestor size and donation sum of each level of their referral tree"""
+    __tablename__ = "referral_level_totals"
+    
+    ancestor_id = Column(BigInteger, ForeignKey("users.tg_id"), primary_key=True)
+    depth = Column(Integer, primary_key=True)
+    members = Column(Integer, default=0, nullable=False)
+    tons_total = Column(Numeric(14, 2), default=0, nullable=False)
+
+
+class ReferralNetworkTotal(Base):
+    """Per-ancestor size and donation sum of their whole referral tree"""
+    __tablename__ = "referral_network_totals"
+    
+    ancestor_id = Column(BigInteger, ForeignKey("users.tg_id"), primary_key=True)
+    network_size = Column(Integer, default=0, nullable=False)
+    network_tons = Column(Numeric(14, 2), default=0, nullable=False)
+
+
+Index("ix_referral_network_size_rank", ReferralNetworkTotal.network_size.desc(), ReferralNetworkTotal.ancestor_id)
+Index("ix_referral_network_tons_rank", ReferralNetworkTotal.network_tons.desc(), ReferralNetworkTotal.ancestor_id)
+
+
+class CollectedCounter(Base):
+    """Running total of all donations, sharded so concurrent inserts don't contend on one row"""
+    __tablename__ = "collected_counters"
+    
+    shard = Column(Integer, primary_key=True)
+    tons_total = Column(Numeric(14, 2), default=0, nullable=False)
+
+
+class RankSnapshot(Base):
+    """
+    Ranks of every ranked user on a board at one point in time, stored columnar:
+    tg_ids is array('q') sorted ascending, ranks is the aligned array('I') (little-endian)
+    """
+    __tablename__ = "rank_snapshots"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    board = Column(String(20), nullable=False)  # all-time / week
+    week_key = Column(String(10), nullable=True)  # For week snapshots
+    taken_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    users_count = Column(Integer, nullable=False)
+    tg_ids = Column(LargeBinary, nullable=False)
+    ranks = Column(LargeBinary, nullable=False)
+
+
+Index("ix_rank_snapshots_board_taken_at", RankSnapshot.board, RankSnapshot.taken_at)
+
+
+class WeekArchive(Base):
+    """A closed week whose final standings were frozen into week_snapshots"""
+    __tablename__ = "week_archives"
+    
+    week_key = Column(String(10), primary_key=True)
+    participants = Column(Integer, nullable=False)
+    frozen_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class WeekSnapshot(Base):
+    """Immutable final row of a closed week's leaderboard (profile fields as of freezing)"""
+    __tablename__ = "week_snapshots"
+    
+    week_key = Column(String(10), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    tg_id = Column(BigInteger, nullable=False)
+    tons_week = Column(Numeric(12, 2), nullable=False)
+    username = Column(String, nullable=True)
+    first_name = Column(String, nullable=True)
+    display_name = Column(String(50), nullable=True)
+    photo_url = Column(String, nullable=True)
+    custom_title = Column(String(50), nullable=True)
+    custom_text = Column(String(200), nullable=True)
+    custom_link = Column(String(500), nullable=True)
+
+
 class Payment(Base):
     __tablename__ = "payments"
     
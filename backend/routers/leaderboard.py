@@ -1,71 +1,425 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional
+from typing import Optional, Hashable, Callable, Awaitable, Tuple
 from backend.database import get_db
-from backend.services import leaderboard_service
-from backend.telegram_auth import validate_telegram_init_data
+from backend.models import UserTotal, UserWeekTotal
+from backend.services import leaderboard_service, rollup_service, week_archive_service
+from backend.services.leaderboard_cache import leaderboard_cache, RenderedBody
+from backend.services.leaderboard_changes import change_logs
+from backend.services.leaderboard_stream import leaderboard_hub
+from backend.services.ranking_index import all_time_index
+from backend.services.profile_cache import PROFILE_FIELDS, FIELD_COLUMNS
+from backend.services.distribution_sketch import distribution, summarize
+from backend.auth import Principal, get_principal, authenticate
 from backend.config import settings
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/leaderboard", tags=["leaderboard"])
 
+BOARDS = ("all-time", "week", "referrals")
+MAX_AROUND_RADIUS = 50
+STREAM_KEEPALIVE_SECONDS = 15
+# Frozen weeks never change
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
 
-async def get_current_user_id(
-    x_init_data: Optional[str] = Header(None, alias="X-Init-Data")
-) -> int:
-    """Extract and validate user from Telegram initData"""
-    if not x_init_data:
-        raise HTTPException(status_code=401, detail="Missing X-Init-Data header")
+
+async def _cached_response(
+    request: Request,
+    key: Hashable,
+    build: Callable[[], Awaitable[dict]],
+    cache_control: str = "private, no-cache"
+) -> Response:
+    """
+    Serve from the versioned leaderboard cache with a content ETag.
+    While the entry is cached, a matching If-None-Match is answered with 304 before
+    any database access; otherwise the body is rebuilt and its ETag compared.
+    Bodies are serialized (and compressed) once per data version, off the event loop.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    body = leaderboard_cache.get(key)
+    if body is None:
+        version = leaderboard_cache.version
+        payload = await build()
+        body = await run_in_threadpool(RenderedBody, payload)
+        leaderboard_cache.put(key, body, version)
     
-    user_data = validate_telegram_init_data(x_init_data)
-    if not user_data or not user_data.get("tg_id"):
-        raise HTTPException(status_code=401, detail="Invalid initData")
+    headers = {"ETag": body.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if if_none_match and _etag_matches(if_none_match, body.etag):
+        return Response(status_code=304, headers=headers)
     
-    return user_data["tg_id"]
+    encoding = _pick_encoding(request.headers.get("accept-encoding", ""), body.available_encodings())
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        content = await run_in_threadpool(body.encoded, encoding)
+    else:
+        content = body.identity
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison (RFC 9110) of an If-None-Match list against our ETag"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def _pick_encoding(accept_encoding: str, available: tuple) -> Optional[str]:
+    """First of `available` (in server preference order) accepted by the client"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    for encoding in available:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
 
 
 @router.get("/collected")
 async def get_total_collected(
-    session: AsyncSession = Depends(get_db),
-    _: int = Depends(get_current_user_id)
+    request: Request,
+    _: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_db)
 ):
     """Get total collected funds (for status bar). Value in same unit as donations (charts)."""
-    total = await leaderboard_service.get_total_collected(session)
-    return {"total_charts": total}
+    async def build():
+        total = await leaderboard_service.get_total_collected(session)
+        return {"total_charts": total}
+    
+    return await _cached_response(request, ("collected",), build)
+
+
+def _page_limit(limit: int) -> int:
+    return max(1, min(limit, settings.leaderboard_limit))
+
+
+def _parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """Profile fields to include in rows (comma-separated); all of PROFILE_FIELDS by default"""
+    if not fields:
+        return PROFILE_FIELDS
+    selected = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in selected if field not in FIELD_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+
+def _parse_cursor(cursor: Optional[str]) -> Optional[leaderboard_service.Cursor]:
+    if not cursor:
+        return None
+    try:
+        return leaderboard_service.decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @router.get("/all-time")
 async def get_all_time_leaderboard(
-    limit: int = settings.leaderboard_limit,
+    request: Request,
+    limit: int = settings.leaderboard_page_size,
     offset: int = 0,
-    session: AsyncSession = Depends(get_db),
-    _: int = Depends(get_current_user_id)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    _: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_db)
 ):
-    """Get all-time leaderboard"""
-    return await leaderboard_service.get_all_time_leaderboard(session, limit, offset)
+    """Get all-time leaderboard page. Pass next_cursor back as `cursor` to get the next page."""
+    limit = _page_limit(limit)
+    after = _parse_cursor(cursor)
+    selected = _parse_fields(fields)
+    
+    async def build():
+        # Read before the data: changes after this version are replayed by /changes
+        version = change_logs["all-time"].version
+        items = await leaderboard_service.get_all_time_leaderboard(session, limit, offset, after, selected)
+        return {
+            "items": items,
+            "next_cursor": leaderboard_service.next_cursor(items, limit, "tons_total"),
+            "version": version
+        }
+    
+    return await _cached_response(request, ("all-time", None, limit, offset, cursor, selected), build)
 
 
 @router.get("/week")
 async def get_week_leaderboard(
+    request: Request,
     week_key: Optional[str] = None,
-    limit: int = settings.leaderboard_limit,
+    limit: int = settings.leaderboard_page_size,
     offset: int = 0,
-    session: AsyncSession = Depends(get_db),
-    _: int = Depends(get_current_user_id)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    _: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_db)
 ):
-    """Get weekly leaderboard"""
-    return await leaderboard_service.get_week_leaderboard(session, week_key, limit, offset)
+    """Get weekly leaderboard page. Ended weeks are served from their frozen snapshot."""
+    limit = _page_limit(limit)
+    after = _parse_cursor(cursor)
+    selected = _parse_fields(fields)
+    week_key = week_key or leaderboard_service.get_week_key()
+    
+    if week_key != leaderboard_service.get_week_key() and await week_archive_service.is_archived(session, week_key):
+        async def build_archived():
+            items = await week_archive_service.get_archived_week_leaderboard(session, week_key, limit, offset, after, selected)
+            return {
+                "items": items,
+                "next_cursor": leaderboard_service.next_cursor(items, limit, "tons_week"),
+                "version": None,
+                "frozen": True
+            }
+        
+        return await _cached_response(
+            request, ("week-archive", week_key, limit, offset, cursor, selected), build_archived, IMMUTABLE_CACHE_CONTROL
+        )
+    
+    async def build():
+        # Read before the data: changes after this version are replayed by /changes
+        version = change_logs["week"].version
+        items = await leaderboard_service.get_week_leaderboard(session, week_key, limit, offset, after, selected)
+        return {
+            "items": items,
+            "next_cursor": leaderboard_service.next_cursor(items, limit, "tons_week"),
+            "version": version
+        }
+    
+    return await _cached_response(request, ("week", week_key, limit, offset, cursor, selected), build)
+
+
+@router.get("/trending")
+async def get_trending_leaderboard(
+    request: Request,
+    limit: int = settings.leaderboard_page_size,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    _: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_db)
+):
+    """Get trending leaderboard page (recent donations weigh more, see trending_half_life_hours)"""
+    limit = _page_limit(limit)
+    after = _parse_cursor(cursor)
+    selected = _parse_fields(fields)
+    
+    async def build():
+        items = await leaderboard_service.get_trending_leaderboard(session, limit, offset, after, selected)
+        return {
+            "items": items,
+            "next_cursor": leaderboard_service.next_cursor(items, limit, "trending_key")
+        }
+    
+    return await _cached_response(request, ("trending", None, limit, offset, cursor, selected), build)
+
+
+@router.get("/weeks")
+async def get_archived_weeks(
+    _: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_db)
+):
+    """List ended (frozen) weeks with their winners, newest first"""
+    return {"weeks": await week_archive_service.list_archived_weeks(session)}
 
 
 @router.get("/referrals")
 async def get_referrals_leaderboard(
-    limit: int = settings.leaderboard_limit,
+    request: Request,
+    limit: int = settings.leaderboard_page_size,
     offset: int = 0,
-    session: AsyncSession = Depends(get_db),
-    _: int = Depends(get_current_user_id)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    _: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_db)
 ):
-    """Get referrals leaderboard"""
-    return await leaderboard_service.get_referrals_leaderboard(session, limit, offset)
+    """Get referrals leaderboard page"""
+    limit = _page_limit(limit)
+    after = _parse_cursor(cursor)
+    selected = _parse_fields(fields)
+    
+    async def build():
+        # Read before the data: changes after this version are replayed by /changes
+        version = change_logs["referrals"].version
+        items = await leaderboard_service.get_referrals_leaderboard(session, limit, offset, after, selected)
+        return {
+            "items": items,
+            "next_cursor": leaderboard_service.next_cursor(items, limit, "referrals_tons_total"),
+            "version": version
+        }
+    
+    return await _cached_response(request, ("referrals", None, limit, offset, cursor, selected), build)
+
 
+@router.get("/period")
+async def get_period_leaderboard(
+    request: Request,
+    period: str = "day",
+    limit: int = settings.leaderboard_page_size,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    _: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_db)
+):
+    """Get leaderboard page for period=day|week|month|rolling_7d|rolling_30d (local timezone)"""
+    if period not in rollup_service.PERIODS:
+        raise HTTPException(status_code=400, detail="Unknown period")
+    limit = _page_limit(limit)
+    after = _parse_cursor(cursor)
+    selected = _parse_fields(fields)
+    # The window moves with time (local midnight, every hour for rolling periods),
+    # so its start is part of the cache key and of the body (and thus the ETag)
+    window = rollup_service.period_window(period)
+    
+    async def build():
+        items = await leaderboard_service.get_period_leaderboard(
+            session, period, limit, offset, after, selected, window
+        )
+        return {
+            "period": period,
+            "since": window.since.isoformat(),
+            "items": items,
+            "next_cursor": leaderboard_service.next_cursor(items, limit, "tons_period")
+        }
+    
+    return await _cached_response(
+        request, ("period", period, window.since, limit, offset, cursor, selected), build
+    )
+
+
+@router.get("/network/{metric}")
+async def get_network_leaderboard(
+    request: Request,
+    metric: str,
+    limit: int = settings.leaderboard_page_size,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    _: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_db)
+):
+    """Get referral network leaderboard page: `size` (members at all levels) or `tons` (their donations)"""
+    if metric not in leaderboard_service.NETWORK_METRICS:
+        raise HTTPException(status_code=404, detail="Unknown network metric")
+    limit = _page_limit(limit)
+    after = _parse_cursor(cursor)
+    selected = _parse_fields(fields)
+    _, score_field = leaderboard_service.NETWORK_METRICS[metric]
+    
+    async def build():
+        items = await leaderboard_service.get_network_leaderboard(session, metric, limit, offset, after, selected)
+        return {
+            "items": items,
+            "next_cursor": leaderboard_service.next_cursor(items, limit, score_field)
+        }
+    
+    return await _cached_response(request, ("network", metric, limit, offset, cursor, selected), build)
+
+
+@router.get("/{board}/around-me")
+async def get_around_me(
+    board: str,
+    radius: int = 5,
+    week_key: Optional[str] = None,
+    fields: Optional[str] = None,
+    principal: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_db)
+):
+    """Get current user's rank with `radius` rows above and below"""
+    if board not in BOARDS:
+        raise HTTPException(status_code=404, detail="Unknown leaderboard")
+    radius = max(0, min(radius, MAX_AROUND_RADIUS))
+    return await leaderboard_service.get_around_me(session, board, principal.tg_id, radius, week_key, _parse_fields(fields))
+
+
+@router.get("/{board}/distribution")
+async def get_distribution(
+    board: str,
+    bins: int = 20,
+    principal: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_db)
+):
+    """Histogram and percentiles of user totals, plus the share of users above the current user"""
+    if board not in ("all-time", "week"):
+        raise HTTPException(status_code=404, detail="Unknown leaderboard")
+    if not distribution.loaded:
+        await distribution.load(session)
+    sketch = distribution.sketch(board)
+    tg_id = principal.tg_id
+    
+    if board == "week":
+        row = await session.get(UserWeekTotal, (distribution.week_key, tg_id))
+        tons = row.tons if row is not None else 0
+    elif all_time_index.loaded:
+        tons = all_time_index.score(tg_id) or 0
+    else:
+        row = await session.get(UserTotal, tg_id)
+        tons = row.tons_all_time if row is not None else 0
+    
+    top_percent = None
+    if float(tons) > 0:
+        top_percent = round(max(sketch.fraction_above(tons) * 100, 0.01), 2)
+    return {
+        "board": board,
+        "week_key": distribution.week_key if board == "week" else None,
+        **summarize(sketch, max(1, min(bins, 100))),
+        "me": {"tons": float(tons), "top_percent": top_percent}
+    }
+
+
+@router.get("/{board}/changes")
+async def get_changes(
+    board: str,
+    since: int,
+    _: Principal = Depends(get_principal)
+):
+    """
+    Row changes after version `since` (the `version` of a page or a previous call).
+    If the log no longer reaches back that far, returns resync=true: reload the board.
+    """
+    if board not in BOARDS:
+        raise HTTPException(status_code=404, detail="Unknown leaderboard")
+    log = change_logs[board]
+    version = log.version
+    changes = log.since(since)
+    if changes is None:
+        return {"version": version, "resync": True, "changes": []}
+    return {"version": version, "resync": False, "changes": changes}
+
+
+@router.get("/stream")
+async def stream_changes(
+    request: Request,
+    init_data: Optional[str] = None,
+    x_init_data: Optional[str] = Header(None, alias="X-Init-Data")
+):
+    """
+    Server-Sent Events stream of leaderboard changes (same shape as /changes).
+    EventSource can't send headers, so initData may be passed as ?init_data=.
+    Events: `changes` (coalesced batch) and `resync` (connection fell behind, reload boards).
+    """
+    authenticate(request, init_data or x_init_data)
+    
+    subscriber = leaderboard_hub.subscribe()
+    
+    async def events():
+        try:
+            yield b"retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+        finally:
+            leaderboard_hub.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
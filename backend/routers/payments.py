@@ -1,10 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional
 from backend.database import get_db
 from backend.services import payment_service, user_service
-from backend.telegram_auth import validate_telegram_init_data
+from backend.auth import Principal, get_principal
 from backend.config import settings
 import logging
 
@@ -20,43 +20,25 @@ class CreateInvoiceRequest(BaseModel):
     crypto_currency: Optional[str] = None  # "TON", "BTC", "ETH", "USDT", etc.
 
 
-async def get_current_user_id(
-    x_init_data: Optional[str] = Header(None, alias="X-Init-Data")
-) -> int:
-    """Extract and validate user from Telegram initData"""
-    if not x_init_data:
-        raise HTTPException(status_code=401, detail="Missing X-Init-Data header")
-    
-    user_data = validate_telegram_init_data(x_init_data)
-    if not user_data or not user_data.get("tg_id"):
-        raise HTTPException(status_code=401, detail="Invalid initData")
-    
-    return user_data["tg_id"]
-
-
 @router.post("/create-invoice")
 async def create_invoice(
     request: CreateInvoiceRequest,
-    x_init_data: str = Header(..., alias="X-Init-Data"),
+    principal: Principal = Depends(get_principal),
     session: AsyncSession = Depends(get_db)
 ):
     """Create payment invoice for Telegram Stars"""
-    user_data = validate_telegram_init_data(x_init_data)
-    if not user_data or not user_data.get("tg_id"):
-        raise HTTPException(status_code=401, detail="Invalid initData")
-    
-    tg_id = user_data["tg_id"]
+    tg_id = principal.tg_id
     
     # Ensure user exists
     await user_service.get_or_create_user(
         session=session,
         tg_id=tg_id,
-        username=user_data.get("username"),
-        first_name=user_data.get("first_name"),
-        last_name=user_data.get("last_name"),
-        language_code=user_data.get("language_code"),
-        is_premium=user_data.get("is_premium"),
-        photo_url=user_data.get("photo_url")
+        username=principal.username,
+        first_name=principal.first_name,
+        last_name=principal.last_name,
+        language_code=principal.language_code,
+        is_premium=principal.is_premium,
+        photo_url=principal.photo_url
     )
     
     # Validate stars amount
@@ -149,7 +131,7 @@ async def create_invoice(
                 # Fallback: use placeholder conversion
                 crypto_amount = stars_amount * 1_000_000  # Placeholder
             
-            user_lang = user_data.get("language_code", "ru")
+            user_lang = principal.language_code or "ru"
             if user_lang.startswith("ru"):
                 title = f"Донат {stars_amount} ⭐"
             else:
@@ -161,7 +143,7 @@ async def create_invoice(
             prices = [LabeledPrice(label="Stars", amount=stars_amount)]
         
         # Get user language for description
-        user_lang = user_data.get("language_code", "ru")
+        user_lang = principal.language_code or "ru"
         description = "Пополнение баланса в лидерборде донатов" if user_lang.startswith("ru") else "Top up donation leaderboard balance"
         
         # Create invoice link
@@ -1,12 +1,12 @@
 """TON Payment endpoints"""
 from decimal import Decimal
 from typing import Optional, Union, Annotated
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, PlainValidator
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.database import get_db
-from backend.telegram_auth import validate_telegram_init_data
+from backend.auth import Principal, get_principal
 from backend.config import settings
 from backend.rate_provider import rate_provider
 from backend.services.ton_service import (
@@ -83,18 +83,14 @@ async def get_ton_config():
 @router.post("/create-payment")
 async def create_payment(
     request: CreateTonPaymentRequest,
-    x_init_data: str = Header(..., alias="X-Init-Data"),
+    principal: Principal = Depends(get_principal),
     session: AsyncSession = Depends(get_db)
 ):
     """Create a new TON payment request"""
-    user_data = validate_telegram_init_data(x_init_data)
-    if not user_data or not user_data.get("tg_id"):
-        raise HTTPException(status_code=401, detail="Invalid initData")
-    
     if not settings.ton_wallet_address:
         raise HTTPException(status_code=503, detail="TON payments not configured")
     
-    tg_id = user_data["tg_id"]
+    tg_id = principal.tg_id
     amount_ton = Decimal(str(request.amount_ton))
     
     if amount_ton < Decimal("0.1"):
@@ -127,21 +123,17 @@ async def create_payment(
 @router.get("/payment/{comment}")
 async def get_payment_status(
     comment: str,
-    x_init_data: str = Header(..., alias="X-Init-Data"),
+    principal: Principal = Depends(get_principal),
     session: AsyncSession = Depends(get_db)
 ):
     """Check payment status by comment"""
-    user_data = validate_telegram_init_data(x_init_data)
-    if not user_data or not user_data.get("tg_id"):
-        raise HTTPException(status_code=401, detail="Invalid initData")
-    
     payment = await get_payment_by_comment(session, comment)
     
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found")
     
     # Verify ownership
-    if payment.tg_id != user_data["tg_id"]:
+    if payment.tg_id != principal.tg_id:
         raise HTTPException(status_code=403, detail="Not your payment")
     
     payment_link = get_ton_payment_link(
@@ -165,15 +157,11 @@ async def get_payment_status(
 
 @router.get("/history")
 async def get_payment_history(
-    x_init_data: str = Header(..., alias="X-Init-Data"),
+    principal: Principal = Depends(get_principal),
     session: AsyncSession = Depends(get_db)
 ):
     """Get user's TON payment history"""
-    user_data = validate_telegram_init_data(x_init_data)
-    if not user_data or not user_data.get("tg_id"):
-        raise HTTPException(status_code=401, detail="Invalid initData")
-    
-    tg_id = user_data["tg_id"]
+    tg_id = principal.tg_id
     payments = await get_user_ton_payments(session, tg_id)
     
     return [
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from pydantic import BaseModel, field_validator, PlainValidator
-from typing import Optional, Union, Annotated
+from typing import Optional, Union, Annotated, List
 from backend.database import get_db
 from backend.models import User
-from backend.services import user_service, leaderboard_service
-from backend.telegram_auth import validate_telegram_init_data, extract_ref_code
+from backend.services import user_service, leaderboard_service, leaderboard_events, referral_tree_service, rank_history_service
+from backend.services.profile_cache import profile_cache, PROFILE_FIELDS
+from backend.auth import Principal, get_principal
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +15,13 @@ logger = logging.getLogger(__name__)
 router = APIRouter(tags=["user"])
 
 
+MAX_STATS_BATCH = 1000
+
+
+class UsersStatsRequest(BaseModel):
+    tg_ids: List[int]
+
+
 class UpdateProfileRequest(BaseModel):
     display_name: Optional[str] = None  # Custom display name (instead of Telegram username)
     custom_title: Optional[str] = None  # Short title for leaderboard
@@ -21,39 +29,25 @@ class UpdateProfileRequest(BaseModel):
     custom_link: Optional[str] = None   # Clickable link
 
 
-async def get_current_user_data(
-    x_init_data: str = Header(..., alias="X-Init-Data")
-) -> dict:
-    """Extract and validate user data from Telegram initData"""
-    user_data = validate_telegram_init_data(x_init_data)
-    if not user_data or not user_data.get("tg_id"):
-        raise HTTPException(status_code=401, detail="Invalid initData")
-    return user_data
-
-
 @router.get("/me")
 async def get_me(
-    x_init_data: str = Header(..., alias="X-Init-Data"),
+    principal: Principal = Depends(get_principal),
     session: AsyncSession = Depends(get_db)
 ):
     """Get current user info and stats, create/update user if needed"""
-    user_data = validate_telegram_init_data(x_init_data)
-    if not user_data or not user_data.get("tg_id"):
-        raise HTTPException(status_code=401, detail="Invalid initData")
-    
-    tg_id = user_data["tg_id"]
+    tg_id = principal.tg_id
     
     # Get or create user
     user, is_new = await user_service.get_or_create_user(
         session=session,
         tg_id=tg_id,
-        username=user_data.get("username"),
-        first_name=user_data.get("first_name"),
-        last_name=user_data.get("last_name"),
-        language_code=user_data.get("language_code"),
-        is_premium=user_data.get("is_premium"),
-        photo_url=user_data.get("photo_url"),
-        init_data=x_init_data
+        username=principal.username,
+        first_name=principal.first_name,
+        last_name=principal.last_name,
+        language_code=principal.language_code,
+        is_premium=principal.is_premium,
+        photo_url=principal.photo_url,
+        init_data=principal.init_data
     )
     
     # Get user stats
@@ -79,19 +73,69 @@ async def get_me(
     }
 
 
+@router.get("/me/referral-tree")
+async def get_referral_tree(
+    depth: Optional[int] = None,
+    limit: int = 50,
+    offset: int = 0,
+    principal: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_db)
+):
+    """Get current user's referral network by level; pass `depth` to list that level's members"""
+    return await referral_tree_service.get_referral_tree(session, principal.tg_id, depth, limit, offset)
+
+
+@router.get("/me/rank-history")
+async def get_rank_history(
+    board: str = "all-time",
+    limit: int = 30,
+    principal: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_db)
+):
+    """Get current user's rank in the latest `limit` rank snapshots (board: all-time or week)"""
+    if board not in rank_history_service.BOARDS:
+        raise HTTPException(status_code=400, detail="Unknown board")
+    history = await rank_history_service.get_rank_history(session, principal.tg_id, board, limit)
+    return {"board": board, "history": history}
+
+
+@router.post("/users/stats")
+async def get_users_stats(
+    request: UsersStatsRequest,
+    _: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_db)
+):
+    """Get stats (same fields as /me) for up to MAX_STATS_BATCH users, in request order"""
+    if len(request.tg_ids) > MAX_STATS_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_STATS_BATCH} tg_ids per request")
+    stats = await leaderboard_service.get_users_stats(session, request.tg_ids)
+    return {"users": [stats[tg_id] for tg_id in dict.fromkeys(request.tg_ids)]}
+
+
+@router.get("/users/{tg_id}/profile")
+async def get_user_profile(
+    tg_id: int,
+    response: Response,
+    _: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_db)
+):
+    """Get a user's leaderboard profile (for the profile modal), served from the profile cache"""
+    profile = (await profile_cache.get_many(session, [tg_id])).get(tg_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    response.headers["Cache-Control"] = "private, max-age=60"
+    return {"tg_id": tg_id, **{field: profile.get(field) for field in PROFILE_FIELDS}}
+
+
 @router.get("/transactions")
 async def get_transactions(
     limit: int = 50,
     offset: int = 0,
-    x_init_data: str = Header(..., alias="X-Init-Data"),
+    principal: Principal = Depends(get_principal),
     session: AsyncSession = Depends(get_db)
 ):
     """Get user transaction history"""
-    user_data = validate_telegram_init_data(x_init_data)
-    if not user_data or not user_data.get("tg_id"):
-        raise HTTPException(status_code=401, detail="Invalid initData")
-    
-    tg_id = user_data["tg_id"]
+    tg_id = principal.tg_id
     
     from sqlalchemy import select, desc
     from backend.models import Payment
@@ -125,15 +169,11 @@ async def get_transactions(
 @router.post("/me/profile")
 async def update_profile(
     request: UpdateProfileRequest,
-    x_init_data: str = Header(..., alias="X-Init-Data"),
+    principal: Principal = Depends(get_principal),
     session: AsyncSession = Depends(get_db)
 ):
     """Update user's profile for leaderboard"""
-    user_data = validate_telegram_init_data(x_init_data)
-    if not user_data or not user_data.get("tg_id"):
-        raise HTTPException(status_code=401, detail="Invalid initData")
-    
-    tg_id = user_data["tg_id"]
+    tg_id = principal.tg_id
     
     # Validate display_name length
     display_name = request.display_name
@@ -184,26 +224,28 @@ async def update_profile(
         user.custom_link = custom_link
     await session.commit()
     
-    logger.info(f"User {tg_id} updated profile: display_name='{user.display_name}', title='{user.custom_title}'")
-    
-    return {
-        "success": True,
+    profile = {
         "display_name": user.display_name,
         "custom_title": user.custom_title,
         "custom_text": user.custom_text,
         "custom_link": user.custom_link
     }
+    leaderboard_events.profile_updated(tg_id, profile)
+    
+    logger.info(f"User {tg_id} updated profile: display_name='{user.display_name}', title='{user.custom_title}'")
+    
+    return {"success": True, **profile}
 
 
 # Keep old endpoint for backwards compatibility
 @router.post("/me/custom-text")
 async def update_custom_text(
     request: UpdateProfileRequest,
-    x_init_data: str = Header(..., alias="X-Init-Data"),
+    principal: Principal = Depends(get_principal),
     session: AsyncSession = Depends(get_db)
 ):
     """Update user's custom text (deprecated, use /me/profile instead)"""
-    return await update_profile(request, x_init_data, session)
+    return await update_profile(request, principal, session)
 
 
 def _parse_amount(v: Union[int, float, str, None]) -> float:
@@ -235,15 +277,11 @@ class SaveWalletRequest(BaseModel):
 @router.post("/me/wallet")
 async def save_wallet(
     request: SaveWalletRequest,
-    x_init_data: str = Header(..., alias="X-Init-Data"),
+    principal: Principal = Depends(get_principal),
     session: AsyncSession = Depends(get_db)
 ):
     """Save user's connected TON wallet address"""
-    user_data = validate_telegram_init_data(x_init_data)
-    if not user_data or not user_data.get("tg_id"):
-        raise HTTPException(status_code=401, detail="Invalid initData")
-    
-    tg_id = user_data["tg_id"]
+    tg_id = principal.tg_id
     
     # Validate wallet address (basic check)
     wallet = request.wallet_address.strip()
@@ -269,29 +307,25 @@ async def save_wallet(
 @router.post("/me/activate-charts")
 async def activate_charts_endpoint(
     request: ActivateChartsRequest,
-    x_init_data: str = Header(..., alias="X-Init-Data"),
+    principal: Principal = Depends(get_principal),
     session: AsyncSession = Depends(get_db)
 ):
     """Activate charts from balance to leaderboard"""
     from backend.services.payment_service import activate_charts
 
     try:
-        user_data = validate_telegram_init_data(x_init_data)
-        if not user_data or not user_data.get("tg_id"):
-            raise HTTPException(status_code=401, detail="Invalid initData")
-
-        tg_id = user_data["tg_id"]
+        tg_id = principal.tg_id
         # Ensure user exists (e.g. if they opened activate before GET /me)
         await user_service.get_or_create_user(
             session=session,
             tg_id=tg_id,
-            username=user_data.get("username"),
-            first_name=user_data.get("first_name"),
-            last_name=user_data.get("last_name"),
-            language_code=user_data.get("language_code"),
-            is_premium=user_data.get("is_premium"),
-            photo_url=user_data.get("photo_url"),
-            init_data=x_init_data,
+            username=principal.username,
+            first_name=principal.first_name,
+            last_name=principal.last_name,
+            language_code=principal.language_code,
+            is_premium=principal.is_premium,
+            photo_url=principal.photo_url,
+            init_data=principal.init_data,
         )
         result = await activate_charts(session, tg_id, request.amount)
 
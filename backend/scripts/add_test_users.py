@@ -9,6 +9,7 @@ from backend.models import User, Donation, Payment
 from backend.database import Base
 from backend.config import settings
 from backend.services.leaderboard_service import get_week_key
+from backend.services import totals_service
 import uuid
 
 # Create async engine
@@ -106,6 +107,7 @@ async def add_test_users():
                 )
                 
                 session.add(donation)
+                await totals_service.record_donation(session, donation)
                 
                 created += 1
                 
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Benchmark leaderboard push over real SSE connections.
+
+Starts the API in one uvicorn worker (subprocess) on a scratch SQLite database,
+opens N streaming connections to /leaderboard/stream, then activates charts
+through the API and measures, per activation, how long until every connection
+received the `changes` frame (end-to-end from the POST, and the spread between
+the first and the last subscriber). Also reports the worker's RSS before and
+after connecting, and its CPU time spent on fan-out.
+
+Usage: python -m backend.scripts.bench_leaderboard_stream [subscribers] [rounds]
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+
+import aiohttp
+
+BOT_TOKEN = "123456:bench"
+BENCH_TG_ID = 1000001
+CONNECT_BATCH = 200
+
+
+def signed_init_data(tg_id: int) -> str:
+    params = {
+        "user": json.dumps({"id": tg_id, "first_name": "Bench"}, separators=(",", ":")),
+        "auth_date": str(int(time.time())),
+    }
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(params.items()))
+    secret = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest()
+    params["hash"] = hmac.new(secret, data_check_string.encode(), hashlib.sha256).hexdigest()
+    return urllib.parse.urlencode(params)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Stream:
+    """One SSE connection; records when each `changes` frame arrived"""
+
+    def __init__(self):
+        self.arrivals = []
+        self.connected = asyncio.Event()
+
+    async def run(self, session: aiohttp.ClientSession, url: str):
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=None)) as response:
+            response.raise_for_status()
+            event = None
+            async for line in response.content:
+                if line.startswith(b"retry:"):
+                    self.connected.set()
+                elif line.startswith(b"event: "):
+                    event = line[7:].strip()
+                elif line.startswith(b"data: ") and event == b"changes":
+                    self.arrivals.append(time.perf_counter())
+
+
+async def wait_ready(base_url: str, proc: subprocess.Popen):
+    async with aiohttp.ClientSession() as session:
+        for _ in range(300):
+            if proc.poll() is not None:
+                raise RuntimeError("API process exited")
+            try:
+                async with session.get(f"{base_url}/health") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("API did not start")
+
+
+async def bench(subscribers: int, rounds: int, base_url: str, pid: int):
+    from sqlalchemy import update
+    from backend.database import AsyncSessionLocal
+    from backend.models import User
+    
+    headers = {"X-Init-Data": signed_init_data(BENCH_TG_ID)}
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async with session.get(f"{base_url}/me", headers=headers) as response:
+            response.raise_for_status()
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(User).where(User.tg_id == BENCH_TG_ID).values(balance_charts=10 ** 6))
+            await db.commit()
+        
+        rss_before = rss_mb(pid)
+        stream_url = f"{base_url}/leaderboard/stream?init_data={urllib.parse.quote(signed_init_data(BENCH_TG_ID))}"
+        streams = [Stream() for _ in range(subscribers)]
+        tasks = []
+        start = time.perf_counter()
+        for i in range(0, subscribers, CONNECT_BATCH):
+            batch = streams[i:i + CONNECT_BATCH]
+            tasks += [asyncio.create_task(stream.run(session, stream_url)) for stream in batch]
+            await asyncio.wait_for(asyncio.gather(*(stream.connected.wait() for stream in batch)), timeout=60)
+        connect_s = time.perf_counter() - start
+        await asyncio.sleep(1)
+        rss_after = rss_mb(pid)
+        print(
+            f"{subscribers} connections in {connect_s:.1f}s; worker RSS {rss_before:.1f} -> {rss_after:.1f} MB "
+            f"({(rss_after - rss_before) * 1024 / subscribers:.1f} KB/connection)"
+        )
+        
+        end_to_end, spread = [], []
+        cpu_start = cpu_seconds(pid)
+        for round_no in range(rounds):
+            sent = time.perf_counter()
+            async with session.post(f"{base_url}/me/activate-charts", json={"amount": 1}, headers=headers) as response:
+                response.raise_for_status()
+            deadline = time.monotonic() + 30
+            while any(len(stream.arrivals) <= round_no for stream in streams):
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"round {round_no}: frame not delivered to every connection")
+                await asyncio.sleep(0.005)
+            arrivals = [stream.arrivals[round_no] for stream in streams]
+            end_to_end.append((max(arrivals) - sent) * 1000)
+            spread.append((max(arrivals) - min(arrivals)) * 1000)
+            await asyncio.sleep(0.5)
+        cpu_used = cpu_seconds(pid) - cpu_start
+        
+        print(
+            f"{rounds} activations: POST -> last subscriber p50={percentile(end_to_end, 0.5):.0f}ms "
+            f"p95={percentile(end_to_end, 0.95):.0f}ms max={max(end_to_end):.0f}ms "
+            f"(includes the hub's 250ms coalescing window)"
+        )
+        print(
+            f"fan-out spread first -> last subscriber p50={percentile(spread, 0.5):.0f}ms "
+            f"p95={percentile(spread, 0.95):.0f}ms max={max(spread):.0f}ms; "
+            f"worker CPU {cpu_used * 1000 / rounds:.0f}ms per activation; RSS {rss_mb(pid):.1f} MB"
+        )
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def main():
+    subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    
+    workdir = tempfile.mkdtemp(prefix="bench_stream_")
+    database_url = f"sqlite+aiosqlite:///{workdir}/bench.db"
+    os.environ.update({"DATABASE_URL": database_url, "BOT_TOKEN": BOT_TOKEN})
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", "1", "--log-level", "warning", "--backlog", "4096"],
+        env=os.environ.copy()
+    )
+    try:
+        asyncio.run(wait_ready(base_url, proc))
+        asyncio.run(bench(subscribers, rounds, base_url, proc.pid))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
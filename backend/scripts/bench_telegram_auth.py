@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-request initData authentication: full verification (secret derived
+per call, as before), verification with the precomputed secret, and the cached path
+used by the API.
+
+Usage: python -m backend.scripts.bench_telegram_auth [iterations]
+"""
+import hashlib
+import hmac
+import json
+import sys
+import time
+import urllib.parse
+
+from backend.config import settings
+from backend import telegram_auth
+
+
+def signed_init_data(tg_id: int) -> str:
+    """initData as the Telegram client would send it"""
+    params = {
+        "query_id": f"AAH{tg_id}",
+        "user": json.dumps({
+            "id": tg_id,
+            "first_name": "Bench",
+            "last_name": "User",
+            "username": f"bench_{tg_id}",
+            "language_code": "en",
+            "is_premium": True,
+            "photo_url": f"https://t.me/i/userpic/320/{tg_id}.jpg",
+        }, separators=(",", ":")),
+        "auth_date": str(int(time.time())),
+    }
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(params.items()))
+    secret = hmac.new(b"WebAppData", settings.bot_token.encode(), hashlib.sha256).digest()
+    params["hash"] = hmac.new(secret, data_check_string.encode(), hashlib.sha256).hexdigest()
+    return urllib.parse.urlencode(params)
+
+
+def timed(fn, init_data: str, iterations: int) -> float:
+    """Mean cost per call, in µs"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(init_data)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def uncached_secret_per_call(init_data: str):
+    telegram_auth._webapp_secret.cache_clear()
+    return telegram_auth._verify_init_data(init_data)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    init_data = signed_init_data(123456789)
+    assert telegram_auth.validate_telegram_init_data(init_data) is not None, "check BOT_TOKEN"
+
+    results = [
+        ("verify, secret per call (before)", timed(uncached_secret_per_call, init_data, iterations)),
+        ("verify, precomputed secret", timed(telegram_auth._verify_init_data, init_data, iterations)),
+        ("cached (validate_telegram_init_data)", timed(telegram_auth.validate_telegram_init_data, init_data, iterations)),
+    ]
+
+    print(f"{iterations} calls, initData {len(init_data)} bytes")
+    baseline = results[0][1]
+    for name, us in results:
+        print(f"{name:40s} {us:8.2f} µs/call  x{baseline / us:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Benchmark batch user stats: leaderboard_service.get_users_stats(tg_ids) vs a loop
+over get_user_stats, on the configured database (seed it with add_test_users first).
+
+Usage: python -m backend.scripts.bench_users_stats [sizes, e.g. 100,1000] [repeats]
+"""
+import asyncio
+import sys
+import time
+
+from sqlalchemy import select
+
+from backend.database import AsyncSessionLocal
+from backend.models import User
+from backend.services import leaderboard_service
+from backend.services.ranking_index import all_time_index
+
+
+async def timed(coro_factory, repeats: int) -> float:
+    """Best of `repeats`, in ms"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await coro_factory()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+async def bench(sizes, repeats: int):
+    async with AsyncSessionLocal() as session:
+        await all_time_index.load(session)
+        for size in sizes:
+            tg_ids = (await session.execute(select(User.tg_id).limit(size))).scalars().all()
+            
+            async def loop():
+                return {tg_id: await leaderboard_service.get_user_stats(session, tg_id) for tg_id in tg_ids}
+            
+            async def batch():
+                return await leaderboard_service.get_users_stats(session, tg_ids)
+            
+            assert await loop() == await batch(), "batch and single-user stats differ"
+            loop_ms = await timed(loop, repeats)
+            batch_ms = await timed(batch, repeats)
+            print(
+                f"ids={len(tg_ids)} loop={loop_ms:.1f}ms batch={batch_ms:.1f}ms "
+                f"speedup={loop_ms / batch_ms:.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1].split(",")] if len(sys.argv) > 1 else [100, 1000]
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    asyncio.run(bench(sizes, repeats))
@@ -9,9 +9,14 @@ import os
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sqlalchemy import select, func, delete
-from backend.database import AsyncSessionLocal
-from backend.models import User, Donation, Payment, TonPayment
+from sqlalchemy import select, func, delete, update, insert, literal, or_
+from sqlalchemy.orm import aliased
+from backend.config import settings
+from backend.database import AsyncSessionLocal, dialect_insert
+from backend.models import (
+    User, Donation, Payment, TonPayment, UserTotal, UserWeekTotal, UserHourTotal, UserDayTotal, UserTrending,
+    CollectedCounter, ReferrerTotal, ReferralClosure, ReferralLevelTotal, ReferralNetworkTotal
+)
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -47,6 +52,20 @@ async def delete_half_users():
             logger.info(f"Selected {len(user_ids_to_delete)} users to delete")
             
             # Delete related data first (to avoid foreign key constraints)
+            # Take the deleted donations off the total collected counter
+            deleted_tons = (await session.execute(
+                select(func.coalesce(func.sum(Donation.tons_amount), 0))
+                .where(Donation.tg_id.in_(user_ids_to_delete))
+            )).scalar() or 0
+            counter_insert = dialect_insert(session, CollectedCounter).values(shard=0, tons_total=-deleted_tons)
+            await session.execute(
+                counter_insert.on_conflict_do_update(
+                    index_elements=[CollectedCounter.shard],
+                    set_={"tons_total": func.round(CollectedCounter.tons_total + counter_insert.excluded.tons_total, 2)}
+                )
+            )
+            logger.info(f"Subtracted {deleted_tons} TON from total collected")
+            
             # Delete donations
             donations_deleted = await session.execute(
                 delete(Donation).where(Donation.tg_id.in_(user_ids_to_delete))
@@ -65,12 +84,141 @@ async def delete_half_users():
             )
             logger.info(f"Deleted {ton_payments_deleted.rowcount} TON payments")
             
+            # Delete all-time and weekly totals
+            totals_deleted = await session.execute(
+                delete(UserTotal).where(UserTotal.tg_id.in_(user_ids_to_delete))
+            )
+            week_totals_deleted = await session.execute(
+                delete(UserWeekTotal).where(UserWeekTotal.tg_id.in_(user_ids_to_delete))
+            )
+            logger.info(f"Deleted {totals_deleted.rowcount} all-time and {week_totals_deleted.rowcount} weekly totals")
+            
+            # Delete hourly and daily rollups
+            hour_totals_deleted = await session.execute(
+                delete(UserHourTotal).where(UserHourTotal.tg_id.in_(user_ids_to_delete))
+            )
+            day_totals_deleted = await session.execute(
+                delete(UserDayTotal).where(UserDayTotal.tg_id.in_(user_ids_to_delete))
+            )
+            logger.info(f"Deleted {hour_totals_deleted.rowcount} hourly and {day_totals_deleted.rowcount} daily totals")
+            
+            # Delete trending scores
+            trending_deleted = await session.execute(
+                delete(UserTrending).where(UserTrending.tg_id.in_(user_ids_to_delete))
+            )
+            logger.info(f"Deleted {trending_deleted.rowcount} trending scores")
+            
+            # Referrals: survivors invited by deleted users lose their referrer;
+            # referrers who lose invitees are recounted below
+            affected_referrers = (await session.execute(
+                select(User.referrer_id).distinct()
+                .where(User.tg_id.in_(user_ids_to_delete))
+                .where(User.referrer_id.is_not(None))
+                .where(User.referrer_id.not_in(user_ids_to_delete))
+            )).scalars().all()
+            await session.execute(
+                update(User)
+                .where(User.referrer_id.in_(user_ids_to_delete))
+                .values(referrer_id=None)
+                .execution_options(synchronize_session=False)
+            )
+            referrer_totals_deleted = await session.execute(
+                delete(ReferrerTotal).where(ReferrerTotal.referrer_id.in_(user_ids_to_delete + list(affected_referrers)))
+            )
+            logger.info(f"Deleted {referrer_totals_deleted.rowcount} referrer totals")
+            
+            # Referral tree: every surviving ancestor of a deleted user loses part of its
+            # network; their closure rows and totals are rebuilt below
+            affected_ancestors = (await session.execute(
+                select(ReferralClosure.ancestor_id).distinct()
+                .where(ReferralClosure.descendant_id.in_(user_ids_to_delete))
+                .where(ReferralClosure.ancestor_id.not_in(user_ids_to_delete))
+            )).scalars().all()
+            stale_ancestors = user_ids_to_delete + list(affected_ancestors)
+            closure_deleted = await session.execute(
+                delete(ReferralClosure).where(or_(
+                    ReferralClosure.ancestor_id.in_(stale_ancestors),
+                    ReferralClosure.descendant_id.in_(user_ids_to_delete)
+                ))
+            )
+            await session.execute(delete(ReferralLevelTotal).where(ReferralLevelTotal.ancestor_id.in_(stale_ancestors)))
+            await session.execute(delete(ReferralNetworkTotal).where(ReferralNetworkTotal.ancestor_id.in_(stale_ancestors)))
+            logger.info(f"Deleted {closure_deleted.rowcount} referral closure rows")
+            
             # Delete users
             users_deleted = await session.execute(
                 delete(User).where(User.tg_id.in_(user_ids_to_delete))
             )
             logger.info(f"Deleted {users_deleted.rowcount} users")
             
+            # Recount the surviving referrers (same query as the referrer_totals backfill)
+            if affected_referrers:
+                await session.execute(
+                    insert(ReferrerTotal).from_select(
+                        ["referrer_id", "referrals_count", "referrals_tons_total"],
+                        select(
+                            User.referrer_id,
+                            func.count(),
+                            func.round(func.coalesce(func.sum(UserTotal.tons_all_time), 0), 2)
+                        )
+                        .outerjoin(UserTotal, UserTotal.tg_id == User.tg_id)
+                        .where(User.referrer_id.in_(affected_referrers))
+                        .group_by(User.referrer_id)
+                    )
+                )
+                logger.info(f"Recounted {len(affected_referrers)} referrers")
+            
+            # Rebuild the networks of the surviving ancestors (as the referral_closure backfill)
+            if affected_ancestors:
+                tree = (
+                    select(
+                        User.referrer_id.label("ancestor_id"),
+                        User.tg_id.label("descendant_id"),
+                        literal(1).label("depth")
+                    )
+                    .where(User.referrer_id.in_(affected_ancestors))
+                    .cte("tree", recursive=True)
+                )
+                child = aliased(User)
+                tree = tree.union_all(
+                    select(tree.c.ancestor_id, child.tg_id, tree.c.depth + 1)
+                    .join(child, child.referrer_id == tree.c.descendant_id)
+                    .where(tree.c.depth < settings.referral_network_depth)
+                )
+                await session.execute(
+                    insert(ReferralClosure).from_select(
+                        ["ancestor_id", "descendant_id", "depth"],
+                        select(tree.c.ancestor_id, tree.c.descendant_id, tree.c.depth)
+                    )
+                )
+                await session.execute(
+                    insert(ReferralLevelTotal).from_select(
+                        ["ancestor_id", "depth", "members", "tons_total"],
+                        select(
+                            ReferralClosure.ancestor_id,
+                            ReferralClosure.depth,
+                            func.count(),
+                            func.round(func.coalesce(func.sum(UserTotal.tons_all_time), 0), 2)
+                        )
+                        .outerjoin(UserTotal, UserTotal.tg_id == ReferralClosure.descendant_id)
+                        .where(ReferralClosure.ancestor_id.in_(affected_ancestors))
+                        .group_by(ReferralClosure.ancestor_id, ReferralClosure.depth)
+                    )
+                )
+                await session.execute(
+                    insert(ReferralNetworkTotal).from_select(
+                        ["ancestor_id", "network_size", "network_tons"],
+                        select(
+                            ReferralLevelTotal.ancestor_id,
+                            func.sum(ReferralLevelTotal.members),
+                            func.round(func.sum(ReferralLevelTotal.tons_total), 2)
+                        )
+                        .where(ReferralLevelTotal.ancestor_id.in_(affected_ancestors))
+                        .group_by(ReferralLevelTotal.ancestor_id)
+                    )
+                )
+                logger.info(f"Rebuilt referral networks of {len(affected_ancestors)} users")
+            
             await session.commit()
             logger.info(f"Successfully deleted {half_count} users and their related data")
             
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Stress user creation: many coroutines call user_service.get_or_create_user for the
+same new tg_id at once (each with its own session, all referred by a fresh referrer).
+Checks that exactly one call reports is_new, one users row exists and the referral
+is counted once. Uses throwaway tg_ids and deletes its rows afterwards.
+
+Usage: python -m backend.scripts.stress_user_upsert [concurrency] [rounds]
+"""
+import asyncio
+import random
+import sys
+import time
+import urllib.parse
+
+from sqlalchemy import select, delete, func, or_
+
+from backend.database import AsyncSessionLocal
+from backend.models import (
+    User, ReferrerTotal, ReferralClosure, ReferralLevelTotal, ReferralNetworkTotal
+)
+from backend.services import user_service
+
+# Far above real Telegram ids
+BASE_TG_ID = 9_000_000_000_000
+
+
+async def create(tg_id: int, init_data: str = None):
+    async with AsyncSessionLocal() as session:
+        user, is_new = await user_service.get_or_create_user(
+            session=session,
+            tg_id=tg_id,
+            username=f"stress_{tg_id}",
+            first_name="Stress",
+            init_data=init_data
+        )
+        return user.tg_id, is_new
+
+
+async def cleanup(tg_ids):
+    async with AsyncSessionLocal() as session:
+        await session.execute(delete(ReferralClosure).where(or_(
+            ReferralClosure.descendant_id.in_(tg_ids), ReferralClosure.ancestor_id.in_(tg_ids)
+        )))
+        await session.execute(delete(ReferralLevelTotal).where(ReferralLevelTotal.ancestor_id.in_(tg_ids)))
+        await session.execute(delete(ReferralNetworkTotal).where(ReferralNetworkTotal.ancestor_id.in_(tg_ids)))
+        await session.execute(delete(ReferrerTotal).where(ReferrerTotal.referrer_id.in_(tg_ids)))
+        await session.execute(delete(User).where(User.referrer_id.in_(tg_ids)))
+        await session.execute(delete(User).where(User.tg_id.in_(tg_ids)))
+        await session.commit()
+
+
+async def round_trip(concurrency: int) -> float:
+    referrer_id = BASE_TG_ID + random.randrange(10 ** 9)
+    tg_id = referrer_id + 1
+    init_data = urllib.parse.urlencode({"start_param": f"ref_{referrer_id}"})
+    try:
+        await create(referrer_id)
+        
+        start = time.perf_counter()
+        results = await asyncio.gather(*(create(tg_id, init_data) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(
+                select(func.count()).select_from(User).where(User.tg_id == tg_id)
+            )).scalar_one()
+            user = await session.get(User, tg_id)
+            referrer_total = await session.get(ReferrerTotal, referrer_id)
+            closure = (await session.execute(
+                select(func.count()).select_from(ReferralClosure).where(ReferralClosure.descendant_id == tg_id)
+            )).scalar_one()
+        
+        created = sum(1 for _, is_new in results if is_new)
+        assert created == 1, f"{created} calls reported is_new"
+        assert rows == 1, f"{rows} users rows"
+        assert user.referrer_id == referrer_id, f"referrer_id={user.referrer_id}"
+        assert referrer_total is not None and referrer_total.referrals_count == 1, "referral not counted once"
+        assert closure == 1, f"{closure} closure rows"
+        return elapsed
+    finally:
+        await cleanup([referrer_id, tg_id])
+
+
+async def main(concurrency: int, rounds: int):
+    for i in range(rounds):
+        elapsed = await round_trip(concurrency)
+        print(f"round {i + 1}: {concurrency} concurrent calls in {elapsed * 1000:.1f} ms - ok")
+
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    asyncio.run(main(concurrency, rounds))
@@ -0,0 +1,194 @@
+"""
+Distribution of per-user totals (all-time and current week) for
+"you're in the top N%" and histogram views, without ranking everyone.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Dict, List, Optional
+from backend.models import User, UserTotal, UserWeekTotal
+from backend.services.leaderboard_service import get_week_key
+from backend.services.totals_service import DonationTotals
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+BOARDS = ("all-time", "week")
+PERCENTILES = (50, 75, 90, 95, 99)
+
+
+class QuantileSketch:
+    """
+    DDSketch-style log-bucket histogram of positive values.
+    Quantiles have relative error <= alpha; memory is one counter per non-empty
+    bucket (about 1000 for 0.01 .. 1e6 at alpha=0.01), independent of how many
+    values were added. Values can be removed, so a user whose total changes is
+    moved between buckets. Sketches with the same alpha merge by adding counters.
+    """
+
+    def __init__(self, alpha: float = 0.01):
+        self.alpha = alpha
+        self._gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets: Dict[int, int] = {}
+        self._count = 0
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def _index(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, index: int) -> float:
+        """Representative value of a bucket (within alpha of everything in it)"""
+        return 2 * self._gamma ** index / (self._gamma + 1)
+
+    def add(self, value, n: int = 1) -> None:
+        value = float(value or 0)
+        if value <= 0:
+            return
+        index = self._index(value)
+        count = self._buckets.get(index, 0) + n
+        if count > 0:
+            self._buckets[index] = count
+        else:
+            self._buckets.pop(index, None)
+        self._count = max(self._count + n, 0)
+
+    def remove(self, value) -> None:
+        self.add(value, -1)
+
+    def move(self, old, new) -> None:
+        """A tracked value changed from `old` to `new`"""
+        self.remove(old)
+        self.add(new)
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot merge sketches with different alpha")
+        for index, count in other._buckets.items():
+            self._buckets[index] = self._buckets.get(index, 0) + count
+        self._count += other._count
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self._count == 0:
+            return None
+        target = q * (self._count - 1)
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen > target:
+                return self._value(index)
+        return self._value(max(self._buckets))
+
+    def fraction_above(self, value) -> float:
+        """Share of values in buckets above the one `value` falls into"""
+        if self._count == 0:
+            return 0.0
+        value = float(value or 0)
+        if value <= 0:
+            return 1.0
+        index = self._index(value)
+        above = sum(count for i, count in self._buckets.items() if i > index)
+        return above / self._count
+
+    def histogram(self, bins: int = 20) -> List[Dict]:
+        """Counts in `bins` log-spaced ranges between the smallest and largest bucket"""
+        if self._count == 0:
+            return []
+        low, high = min(self._buckets), max(self._buckets)
+        width = max(math.ceil((high - low + 1) / bins), 1)
+        result = []
+        for start in range(low, high + 1, width):
+            end = start + width
+            result.append({
+                "min": round(self._gamma ** (start - 1), 2),
+                "max": round(self._gamma ** (end - 1), 2),
+                "count": sum(self._buckets.get(i, 0) for i in range(start, end))
+            })
+        return result
+
+
+class DistributionSketches:
+    """Process-local sketches of all-time and current-week totals, updated on every donation"""
+
+    def __init__(self):
+        self.all_time = QuantileSketch()
+        self.week = QuantileSketch()
+        self.week_key: Optional[str] = None
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def sketch(self, board: str) -> QuantileSketch:
+        if board == "week":
+            self._roll_week(get_week_key())
+            return self.week
+        return self.all_time
+
+    def _roll_week(self, week_key: str) -> None:
+        if week_key != self.week_key:
+            self.week = QuantileSketch()
+            self.week_key = week_key
+
+    def on_donation(self, totals: DonationTotals) -> None:
+        amount = float(totals.tons_amount)
+        self.all_time.move(float(totals.tons_all_time) - amount, totals.tons_all_time)
+        if self.week_key is None or totals.week_key >= self.week_key:
+            self._roll_week(totals.week_key)
+            self.week.move(float(totals.tons_week) - amount, totals.tons_week)
+
+    async def load(self, session: AsyncSession) -> None:
+        """
+        Build the sketches from the totals tables (one scan of each).
+        Always rebuilt rather than restored: a saved sketch misses activations made
+        after it was written, and later moves would remove values it never had.
+        """
+        week_key = get_week_key()
+        
+        all_time = QuantileSketch()
+        totals = await session.execute(
+            select(UserTotal.tons_all_time)
+            .join(User, User.tg_id == UserTotal.tg_id)
+            .where(UserTotal.tons_all_time > 0)
+            .where(User.is_blocked == False)
+        )
+        for tons in totals.scalars():
+            all_time.add(tons)
+        
+        week = QuantileSketch()
+        totals = await session.execute(
+            select(UserWeekTotal.tons)
+            .join(User, User.tg_id == UserWeekTotal.tg_id)
+            .where(UserWeekTotal.week_key == week_key)
+            .where(UserWeekTotal.tons > 0)
+            .where(User.is_blocked == False)
+        )
+        for tons in totals.scalars():
+            week.add(tons)
+        
+        self.all_time = all_time
+        self.week = week
+        self.week_key = week_key
+        self._loaded = True
+        logger.info(f"Distribution sketches loaded: {self.all_time.count} all-time, {self.week.count} week")
+
+
+def summarize(sketch: QuantileSketch, bins: int = 20) -> Dict:
+    """Percentiles and histogram of a sketch"""
+    percentiles = {}
+    for p in PERCENTILES:
+        value = sketch.quantile(p / 100)
+        percentiles[f"p{p}"] = round(value, 2) if value is not None else None
+    return {
+        "count": sketch.count,
+        "percentiles": percentiles,
+        "histogram": sketch.histogram(bins)
+    }
+
+
+# Global instance
+distribution = DistributionSketches()
@@ -0,0 +1,55 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from array import array
+from bisect import bisect_left
+from backend.models import User
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class KnownUsers:
+    """
+    Process-local set of existing tg_ids: a sorted array('q'), 8 bytes per user.
+
+    Loaded at startup and extended after every user insert, so get_or_create_user
+    can send a first-time visitor straight to the creating upsert without a SELECT.
+    Users created by another process (API vs polling bot) are missing until the next
+    load; that is harmless, because the upsert handles an existing row as well.
+    Before load, every tg_id is reported as possibly existing.
+    """
+
+    def __init__(self):
+        self._ids = array("q")
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    async def load(self, session: AsyncSession) -> None:
+        """(Re)build the set from the database"""
+        result = await session.execute(select(User.tg_id).order_by(User.tg_id))
+        self._ids = array("q", result.scalars())
+        self._loaded = True
+        logger.info(f"Known users loaded: {len(self._ids)} users")
+
+    def __contains__(self, tg_id: int) -> bool:
+        i = bisect_left(self._ids, tg_id)
+        return i < len(self._ids) and self._ids[i] == tg_id
+
+    def might_exist(self, tg_id: int) -> bool:
+        """False only if the user is definitely not in the database (as of load + own inserts)"""
+        return not self._loaded or tg_id in self
+
+    def add(self, tg_id: int) -> None:
+        i = bisect_left(self._ids, tg_id)
+        if i == len(self._ids) or self._ids[i] != tg_id:
+            self._ids.insert(i, tg_id)
+
+
+# Global instance
+known_users = KnownUsers()
@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Hashable, Optional
+from backend.config import settings
+import gzip
+import hashlib
+import json
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip is offered
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+
+class RenderedBody:
+    """
+    Response payload serialized to JSON bytes once, with compressed variants
+    built on first use and kept for the lifetime of the cache entry.
+    The ETag is a hash of the JSON; it is weak because the gzip/br variants
+    are different bytes of the same representation.
+    """
+    
+    def __init__(self, payload: Any):
+        self.identity = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.etag = f'W/"{hashlib.sha1(self.identity).hexdigest()[:20]}"'
+        self._variants: Dict[str, bytes] = {}
+    
+    def available_encodings(self) -> tuple:
+        if len(self.identity) < MIN_COMPRESS_SIZE:
+            return ()
+        return ("br", "gzip") if brotli is not None else ("gzip",)
+    
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        """Body bytes for a Content-Encoding (None for identity)"""
+        if encoding is None:
+            return self.identity
+        body = self._variants.get(encoding)
+        if body is None:
+            if encoding == "br":
+                body = brotli.compress(self.identity, quality=5)
+            else:
+                body = gzip.compress(self.identity, compresslevel=6)
+            self._variants[encoding] = body
+        return body
+
+
+class LeaderboardCache:
+    """
+    Versioned cache of rendered leaderboard responses (RenderedBody).
+
+    Every write that can change a board (donation activation, profile update,
+    new user) bumps the version, which invalidates all entries at once.
+    Writes from other processes (bot, scripts) and time-driven changes don't
+    reach this counter, so entries also expire after `leaderboard_cache_ttl_seconds`.
+    A live entry answers If-None-Match with a 304 without any database access;
+    once it is gone the body is rebuilt and compared by its content ETag.
+    """
+    
+    def __init__(self, max_entries: int = 512):
+        self._version = 0
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+    
+    @property
+    def version(self) -> int:
+        return self._version
+    
+    def bump(self) -> None:
+        """Invalidate all cached responses"""
+        self._version += 1
+        self._entries.clear()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        version, expires_at, payload = entry
+        if version != self._version or datetime.utcnow() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return payload
+    
+    def put(self, key: Hashable, payload: Any, version: int) -> None:
+        """Store payload computed at `version` (dropped if a write happened meanwhile)"""
+        if version != self._version:
+            return
+        expires_at = datetime.utcnow() + timedelta(seconds=settings.leaderboard_cache_ttl_seconds)
+        self._entries[key] = (version, expires_at, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+# Global instance
+leaderboard_cache = LeaderboardCache()
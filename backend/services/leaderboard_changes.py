@@ -0,0 +1,46 @@
+from collections import deque
+from typing import Dict, List, Optional
+import time
+
+
+class ChangeLog:
+    """
+    Version counter and bounded log of row changes for one leaderboard.
+
+    Changes carry absolute values (new score, new profile fields), so replaying
+    a change the client already has is harmless. Versions start from the
+    process start time in milliseconds, so they keep increasing across restarts.
+    """
+    
+    def __init__(self, max_entries: int = 2000):
+        self._version = int(time.time() * 1000)
+        self._log: deque = deque(maxlen=max_entries)
+    
+    @property
+    def version(self) -> int:
+        return self._version
+    
+    def append(self, change: Dict) -> Dict:
+        """Record a change; returns it stamped with its version"""
+        self._version += 1
+        change = {"version": self._version, **change}
+        self._log.append(change)
+        return change
+    
+    def since(self, version: int) -> Optional[List[Dict]]:
+        """Changes after `version`, or None if the log no longer covers it (full resync needed)"""
+        if version == self._version:
+            return []
+        if version > self._version:
+            return None
+        if not self._log or self._log[0]["version"] > version + 1:
+            return None
+        return [change for change in self._log if change["version"] > version]
+
+
+# One log per board
+change_logs = {
+    "all-time": ChangeLog(),
+    "week": ChangeLog(),
+    "referrals": ChangeLog(),
+}
@@ -0,0 +1,69 @@
+"""Hooks called by write paths after their transaction commits"""
+from typing import Dict
+from backend.services.ranking_index import all_time_index
+from backend.services.leaderboard_cache import leaderboard_cache
+from backend.services.leaderboard_changes import change_logs
+from backend.services.leaderboard_stream import leaderboard_hub
+from backend.services.distribution_sketch import distribution
+from backend.services.profile_cache import profile_cache
+from backend.services.totals_service import DonationTotals
+
+
+def _record(board: str, change: Dict) -> None:
+    """Append to the board's change log and push to live subscribers"""
+    leaderboard_hub.publish(board, change_logs[board].append(change))
+
+
+def donation_activated(totals: DonationTotals) -> None:
+    """A Donation was committed"""
+    if all_time_index.loaded:
+        all_time_index.set_score(totals.tg_id, totals.tons_all_time)
+    if distribution.loaded:
+        distribution.on_donation(totals)
+    leaderboard_cache.bump()
+    
+    _record("all-time", {
+        "op": "score",
+        "tg_id": totals.tg_id,
+        "score": float(totals.tons_all_time)
+    })
+    # First donation of the week adds the user to the weekly board
+    _record("week", {
+        "op": "insert" if totals.first_of_week else "score",
+        "tg_id": totals.tg_id,
+        "week_key": totals.week_key,
+        "score": float(totals.tons_week)
+    })
+    if totals.referrer_id is not None:
+        _record("referrals", {
+            "op": "score",
+            "tg_id": totals.referrer_id,
+            "score": float(totals.referrals_tons_total or 0)
+        })
+
+
+def user_created(tg_id: int) -> None:
+    """A new user was committed (shows up on the all-time board with zero)"""
+    if all_time_index.loaded:
+        all_time_index.add_user(tg_id)
+    leaderboard_cache.bump()
+    _record("all-time", {"op": "insert", "tg_id": tg_id, "score": 0.0})
+
+
+def referral_attached(referrer_id: int, referrals_count: int, referrals_tons_total) -> None:
+    """A user was attached to a referrer (first referral adds the referrer to the board)"""
+    leaderboard_cache.bump()
+    _record("referrals", {
+        "op": "insert" if referrals_count == 1 else "score",
+        "tg_id": referrer_id,
+        "score": float(referrals_tons_total or 0),
+        "referrals_count": referrals_count
+    })
+
+
+def profile_updated(tg_id: int, fields: Dict) -> None:
+    """Fields shown on leaderboards (name, title, text, link) changed"""
+    profile_cache.invalidate(tg_id)
+    leaderboard_cache.bump()
+    for board in change_logs:
+        _record(board, {"op": "profile", "tg_id": tg_id, "fields": fields})
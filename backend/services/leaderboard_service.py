@@ -1,13 +1,49 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc
+from sqlalchemy import select, func, desc, or_, and_
 from sqlalchemy.orm import aliased
-from typing import List, Dict, Optional
-from backend.models import User, Donation
+from typing import List, Dict, Optional, NamedTuple, Sequence
+from backend.models import ReferralNetworkTotal, ReferrerTotal, User, UserTotal, UserTrending, UserWeekTotal
 from backend.config import settings
+from backend.services.ranking_index import all_time_index
+from backend.services.leaderboard_cache import leaderboard_cache
+from backend.services.profile_cache import profile_cache, PROFILE_FIELDS
+from backend.services import totals_service, rollup_service, trending_service
 from datetime import datetime
+from decimal import Decimal, InvalidOperation
+import base64
 import pytz
 
 
+class Cursor(NamedTuple):
+    """Keyset position: last row of the previous page"""
+    score: Decimal
+    tg_id: int
+    rank: int
+
+
+def encode_cursor(score, tg_id: int, rank: int) -> str:
+    raw = f"{Decimal(str(score))}:{tg_id}:{rank}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Parse opaque cursor. Raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        score, tg_id, rank = raw.split(":")
+        return Cursor(Decimal(score), int(tg_id), int(rank))
+    except (ValueError, InvalidOperation, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def next_cursor(items: List[Dict], limit: int, score_field: str) -> Optional[str]:
+    """Cursor for the page after `items`, or None if this was the last page"""
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(last[score_field], last["tg_id"], last["rank"])
+
+
 def get_week_key(dt: Optional[datetime] = None) -> str:
     """Get week key in format 'YYYY-WNN' for Europe/Berlin timezone"""
     if dt is None:
@@ -20,269 +56,517 @@ def get_week_key(dt: Optional[datetime] = None) -> str:
 
 
 async def get_total_collected(session: AsyncSession) -> float:
-    """Get total collected amount (sum of all donations in charts/tons)"""
-    query = select(func.coalesce(func.sum(Donation.tons_amount), 0)).select_from(Donation)
-    result = await session.execute(query)
-    return float(result.scalar() or 0)
+    """Get total collected amount (sum of all donations in charts/tons), from the running counter"""
+    return float(await totals_service.get_total_collected(session))
+
+
+def _profile_fields(profiles: Dict[int, Dict], tg_id: int, fields: Sequence[str]) -> Dict:
+    """Requested profile fields of a ranked row (None if the user vanished after ranking)"""
+    profile = profiles.get(tg_id, {})
+    return {field: profile.get(field) for field in fields}
 
 
 async def get_all_time_leaderboard(
     session: AsyncSession,
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    after: Optional[Cursor] = None,
+    fields: Sequence[str] = PROFILE_FIELDS
 ) -> List[Dict]:
-    """Get all-time leaderboard sorted by total tons"""
+    """Get all-time leaderboard sorted by total tons (served from the in-memory ranking index)"""
+    await all_time_index.ensure_loaded(session)
+    
+    if after is not None:
+        offset = all_time_index.position_after(after.score, after.tg_id)
+    
+    entries = all_time_index.page(offset, limit)
+    profiles = await profile_cache.get_many(session, [tg_id for tg_id, _ in entries], fields)
+    
+    # Users blocked or deleted since the index was loaded: drop them and re-read the page
+    # until every entry has a profile, so a full page (and next_cursor) is returned
+    missing = [tg_id for tg_id, _ in entries if tg_id not in profiles]
+    while missing:
+        for tg_id in missing:
+            all_time_index.remove(tg_id)
+        entries = all_time_index.page(offset, limit)
+        profiles.update(await profile_cache.get_many(
+            session, [tg_id for tg_id, _ in entries if tg_id not in profiles], fields
+        ))
+        missing = [tg_id for tg_id, _ in entries if tg_id not in profiles]
+    
+    leaderboard = []
+    for rank, (tg_id, tons_total) in enumerate(entries, start=offset + 1):
+        leaderboard.append({
+            "rank": rank,
+            "tg_id": tg_id,
+            **_profile_fields(profiles, tg_id, fields),
+            "tons_total": float(tons_total)
+        })
+    
+    return leaderboard
+
+
+async def get_week_leaderboard(
+    session: AsyncSession,
+    week_key: Optional[str] = None,
+    limit: int = 50,
+    offset: int = 0,
+    after: Optional[Cursor] = None,
+    fields: Sequence[str] = PROFILE_FIELDS
+) -> List[Dict]:
+    """Weekly leaderboard: only current week (week_key), only users who have deposits this week."""
+    if week_key is None:
+        week_key = get_week_key()
+    
+    # Only users with a positive total in this week (pre-aggregated per week)
     query = (
-        select(
-            User.tg_id,
-            User.username,
-            User.first_name,
-            User.display_name,
-            User.photo_url,
-            User.custom_title,
-            User.custom_text,
-            User.custom_link,
-            func.coalesce(func.sum(Donation.tons_amount), 0).label("tons_total")
-        )
-        .outerjoin(Donation, User.tg_id == Donation.tg_id)
+        select(UserWeekTotal.tg_id, UserWeekTotal.tons.label("tons_week"))
+        .join(User, User.tg_id == UserWeekTotal.tg_id)
+        .where(UserWeekTotal.week_key == week_key)
+        .where(UserWeekTotal.tons > 0)
         .where(User.is_blocked == False)
-        .group_by(User.tg_id, User.username, User.first_name, User.display_name, User.photo_url, User.custom_title, User.custom_text, User.custom_link)
-        .order_by(desc("tons_total"), User.tg_id)
+        .order_by(desc(UserWeekTotal.tons), UserWeekTotal.tg_id)
         .limit(limit)
-        .offset(offset)
     )
     
+    # Keyset pagination: continue strictly after the cursor row
+    if after is not None:
+        query = query.where(or_(
+            UserWeekTotal.tons < after.score,
+            and_(UserWeekTotal.tons == after.score, UserWeekTotal.tg_id > after.tg_id)
+        ))
+        start_rank = after.rank + 1
+    else:
+        query = query.offset(offset)
+        start_rank = offset + 1
+    
     result = await session.execute(query)
     rows = result.all()
     
+    profiles = await profile_cache.get_many(session, [row.tg_id for row in rows], fields)
     leaderboard = []
-    for rank, row in enumerate(rows, start=offset + 1):
+    for rank, row in enumerate(rows, start=start_rank):
         leaderboard.append({
             "rank": rank,
             "tg_id": row.tg_id,
-            "username": row.username,
-            "first_name": row.first_name,
-            "display_name": row.display_name,
-            "photo_url": row.photo_url,
-            "custom_title": row.custom_title,
-            "custom_text": row.custom_text,
-            "custom_link": row.custom_link,
-            "tons_total": float(row.tons_total)
+            **_profile_fields(profiles, row.tg_id, fields),
+            "tons_week": float(row.tons_week)
         })
     
     return leaderboard
 
 
-async def get_week_leaderboard(
+async def get_trending_leaderboard(
     session: AsyncSession,
-    week_key: Optional[str] = None,
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    after: Optional[Cursor] = None,
+    fields: Sequence[str] = PROFILE_FIELDS
 ) -> List[Dict]:
-    """Weekly leaderboard: only current week (week_key), only users who have deposits this week."""
-    if week_key is None:
-        week_key = get_week_key()
+    """
+    Get trending leaderboard: donations decayed by age (see trending_service).
+    Ordered by the stored log-space score, which is what cursors carry.
+    """
+    query = (
+        select(UserTrending.tg_id, UserTrending.log_score)
+        .select_from(UserTrending)
+        .join(User, User.tg_id == UserTrending.tg_id)
+        .where(User.is_blocked == False)
+        .order_by(desc(UserTrending.log_score), UserTrending.tg_id)
+        .limit(limit)
+    )
     
-    # Only users with at least one donation in this week (sum > 0)
-    subq = (
-        select(
-            Donation.tg_id,
-            func.coalesce(func.sum(Donation.tons_amount), 0).label("tons_week")
-        )
-        .where(Donation.week_key == week_key)
-        .group_by(Donation.tg_id)
-        .having(func.coalesce(func.sum(Donation.tons_amount), 0) > 0)
-    ).subquery()
+    # Keyset pagination: continue strictly after the cursor row
+    if after is not None:
+        score = float(after.score)
+        query = query.where(or_(
+            UserTrending.log_score < score,
+            and_(UserTrending.log_score == score, UserTrending.tg_id > after.tg_id)
+        ))
+        start_rank = after.rank + 1
+    else:
+        query = query.offset(offset)
+        start_rank = offset + 1
+    
+    rows = (await session.execute(query)).all()
     
+    profiles = await profile_cache.get_many(session, [row.tg_id for row in rows], fields)
+    now = datetime.utcnow()
+    leaderboard = []
+    for rank, row in enumerate(rows, start=start_rank):
+        leaderboard.append({
+            "rank": rank,
+            "tg_id": row.tg_id,
+            **_profile_fields(profiles, row.tg_id, fields),
+            "trending_score": round(trending_service.decayed_score(row.log_score, now), 2),
+            "trending_key": row.log_score
+        })
+    
+    return leaderboard
+
+
+async def get_referrals_leaderboard(
+    session: AsyncSession,
+    limit: int = 50,
+    offset: int = 0,
+    after: Optional[Cursor] = None,
+    fields: Sequence[str] = PROFILE_FIELDS
+) -> List[Dict]:
+    """
+    Get referrals leaderboard sorted by total referrals tons (only users who have referrals).
+    Reads the referrer_totals projection in index order; no aggregation per request.
+    """
     query = (
         select(
-            User.tg_id,
-            User.username,
-            User.first_name,
-            User.display_name,
-            User.photo_url,
-            User.custom_title,
-            User.custom_text,
-            User.custom_link,
-            subq.c.tons_week
+            ReferrerTotal.referrer_id.label("tg_id"),
+            ReferrerTotal.referrals_count,
+            ReferrerTotal.referrals_tons_total
         )
-        .join(subq, User.tg_id == subq.c.tg_id)
+        .select_from(ReferrerTotal)
+        .join(User, User.tg_id == ReferrerTotal.referrer_id)
+        .where(ReferrerTotal.referrals_count > 0)
         .where(User.is_blocked == False)
-        .order_by(desc(subq.c.tons_week), User.tg_id)
+        .order_by(desc(ReferrerTotal.referrals_tons_total), ReferrerTotal.referrer_id)
         .limit(limit)
-        .offset(offset)
     )
     
+    # Keyset pagination: continue strictly after the cursor row
+    if after is not None:
+        query = query.where(or_(
+            ReferrerTotal.referrals_tons_total < after.score,
+            and_(ReferrerTotal.referrals_tons_total == after.score, ReferrerTotal.referrer_id > after.tg_id)
+        ))
+        start_rank = after.rank + 1
+    else:
+        query = query.offset(offset)
+        start_rank = offset + 1
+    
     result = await session.execute(query)
     rows = result.all()
     
+    profiles = await profile_cache.get_many(session, [row.tg_id for row in rows], fields)
     leaderboard = []
-    for rank, row in enumerate(rows, start=offset + 1):
+    for rank, row in enumerate(rows, start=start_rank):
         leaderboard.append({
             "rank": rank,
             "tg_id": row.tg_id,
-            "username": row.username,
-            "first_name": row.first_name,
-            "display_name": row.display_name,
-            "photo_url": row.photo_url,
-            "custom_title": row.custom_title,
-            "custom_text": row.custom_text,
-            "custom_link": row.custom_link,
-            "tons_week": float(row.tons_week)
+            **_profile_fields(profiles, row.tg_id, fields),
+            "referrals_count": int(row.referrals_count),
+            "referrals_tons_total": float(row.referrals_tons_total)
         })
     
     return leaderboard
 
 
-async def get_referrals_leaderboard(
+async def get_period_leaderboard(
     session: AsyncSession,
+    period: str,
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    after: Optional[Cursor] = None,
+    fields: Sequence[str] = PROFILE_FIELDS,
+    window: Optional[rollup_service.PeriodWindow] = None
 ) -> List[Dict]:
-    """Get referrals leaderboard sorted by total referrals tons"""
-    # Subquery: total tons from referrals per referrer
-    referrals_alias = aliased(User)
-    donations_alias = aliased(Donation)
+    """
+    Leaderboard over a time window (see rollup_service.PERIODS), summed from
+    hour/day buckets: cost depends on the window, not on the donations table.
+    `window` defaults to the period's current window.
+    Raises ValueError for an unknown period.
+    """
+    if window is None:
+        window = rollup_service.period_window(period)
+    totals = rollup_service.window_totals(window)
     
-    subquery = (
-        select(
-            referrals_alias.referrer_id.label("referrer_id"),
-            func.count(func.distinct(referrals_alias.tg_id)).label("referrals_count"),
-            func.coalesce(func.sum(donations_alias.tons_amount), 0).label("referrals_tons_total")
-        )
-        .select_from(referrals_alias)
-        .outerjoin(donations_alias, referrals_alias.tg_id == donations_alias.tg_id)
-        .where(referrals_alias.referrer_id.isnot(None))
-        .group_by(referrals_alias.referrer_id)
-    ).subquery()
+    query = (
+        select(totals.c.tg_id, totals.c.score)
+        .join(User, User.tg_id == totals.c.tg_id)
+        .where(totals.c.score > 0)
+        .where(User.is_blocked == False)
+        .order_by(desc(totals.c.score), totals.c.tg_id)
+        .limit(limit)
+    )
+    
+    # Keyset pagination: continue strictly after the cursor row
+    if after is not None:
+        query = query.where(or_(
+            totals.c.score < after.score,
+            and_(totals.c.score == after.score, totals.c.tg_id > after.tg_id)
+        ))
+        start_rank = after.rank + 1
+    else:
+        query = query.offset(offset)
+        start_rank = offset + 1
+    
+    rows = (await session.execute(query)).all()
+    
+    profiles = await profile_cache.get_many(session, [row.tg_id for row in rows], fields)
+    leaderboard = []
+    for rank, row in enumerate(rows, start=start_rank):
+        leaderboard.append({
+            "rank": rank,
+            "tg_id": row.tg_id,
+            **_profile_fields(profiles, row.tg_id, fields),
+            "tons_period": float(row.score)
+        })
+    
+    return leaderboard
+
+
+# Network leaderboards: metric name -> (ordering column, response field)
+NETWORK_METRICS = {
+    "size": (ReferralNetworkTotal.network_size, "network_size"),
+    "tons": (ReferralNetworkTotal.network_tons, "network_tons"),
+}
+
+
+async def get_network_leaderboard(
+    session: AsyncSession,
+    metric: str,
+    limit: int = 50,
+    offset: int = 0,
+    after: Optional[Cursor] = None,
+    fields: Sequence[str] = PROFILE_FIELDS
+) -> List[Dict]:
+    """Users ranked by the size or donation sum of their whole referral tree"""
+    if metric not in NETWORK_METRICS:
+        raise ValueError(f"Unknown network metric: {metric}")
+    score, _ = NETWORK_METRICS[metric]
     
     query = (
         select(
-            User.tg_id,
-            User.username,
-            User.first_name,
-            User.display_name,
-            User.photo_url,
-            User.custom_title,
-            User.custom_text,
-            User.custom_link,
-            func.coalesce(subquery.c.referrals_count, 0).label("referrals_count"),
-            func.coalesce(subquery.c.referrals_tons_total, 0).label("referrals_tons_total")
+            ReferralNetworkTotal.ancestor_id.label("tg_id"),
+            ReferralNetworkTotal.network_size,
+            ReferralNetworkTotal.network_tons
         )
-        .outerjoin(subquery, User.tg_id == subquery.c.referrer_id)
+        .select_from(ReferralNetworkTotal)
+        .join(User, User.tg_id == ReferralNetworkTotal.ancestor_id)
+        .where(ReferralNetworkTotal.network_size > 0)
         .where(User.is_blocked == False)
-        .group_by(
-            User.tg_id,
-            User.username,
-            User.first_name,
-            User.display_name,
-            User.photo_url,
-            User.custom_title,
-            User.custom_text,
-            User.custom_link,
-            subquery.c.referrals_count,
-            subquery.c.referrals_tons_total
-        )
-        .order_by(desc("referrals_tons_total"), User.tg_id)
+        .order_by(desc(score), ReferralNetworkTotal.ancestor_id)
         .limit(limit)
-        .offset(offset)
     )
     
-    result = await session.execute(query)
-    rows = result.all()
+    # Keyset pagination: continue strictly after the cursor row
+    if after is not None:
+        query = query.where(or_(
+            score < after.score,
+            and_(score == after.score, ReferralNetworkTotal.ancestor_id > after.tg_id)
+        ))
+        start_rank = after.rank + 1
+    else:
+        query = query.offset(offset)
+        start_rank = offset + 1
+    
+    rows = (await session.execute(query)).all()
     
+    profiles = await profile_cache.get_many(session, [row.tg_id for row in rows], fields)
     leaderboard = []
-    actual_rank = 0
-    for row in rows:
-        # Include users who have referrals (even if no tons yet)
-        if int(row.referrals_count) > 0:
-            actual_rank += 1
-            leaderboard.append({
-                "rank": actual_rank,
-                "tg_id": row.tg_id,
-                "username": row.username,
-                "first_name": row.first_name,
-                "display_name": row.display_name,
-                "photo_url": row.photo_url,
-                "custom_title": row.custom_title,
-                "custom_text": row.custom_text,
-                "custom_link": row.custom_link,
-                "referrals_count": int(row.referrals_count),
-                "referrals_tons_total": float(row.referrals_tons_total)
-            })
+    for rank, row in enumerate(rows, start=start_rank):
+        leaderboard.append({
+            "rank": rank,
+            "tg_id": row.tg_id,
+            **_profile_fields(profiles, row.tg_id, fields),
+            "network_size": int(row.network_size),
+            "network_tons": float(row.network_tons)
+        })
     
     return leaderboard
 
 
+async def _around_keyset(
+    session: AsyncSession,
+    ranked,
+    tg_id: int,
+    radius: int,
+    get_page
+) -> Dict:
+    """
+    Rank window over a (tg_id, score) relation ordered by (score desc, tg_id).
+    Only touches the user's row, the rows ranked above them (counted via the index)
+    and the radius rows on each side; the rest of the ranking is never materialized.
+    """
+    mine = (await session.execute(select(ranked.c.score).where(ranked.c.tg_id == tg_id))).scalar()
+    if mine is None:
+        return {"rank": None, "items": []}
+    
+    ranked_above = or_(ranked.c.score > mine, and_(ranked.c.score == mine, ranked.c.tg_id < tg_id))
+    users_above = (
+        await session.execute(select(func.count()).select_from(ranked).where(ranked_above))
+    ).scalar() or 0
+    rank = users_above + 1
+    
+    # Nearest rows above, closest first; one extra row serves as the page cursor
+    above = (
+        await session.execute(
+            select(ranked.c.score, ranked.c.tg_id)
+            .where(ranked_above)
+            .order_by(ranked.c.score, desc(ranked.c.tg_id))
+            .limit(radius + 1)
+        )
+    ).all()
+    
+    if len(above) > radius:
+        start = above[radius]
+        items = await get_page(2 * radius + 1, Cursor(start.score, start.tg_id, rank - radius - 1))
+    else:
+        items = await get_page(len(above) + 1 + radius, None)
+    
+    return {"rank": rank, "items": items}
+
+
+async def get_around_me(
+    session: AsyncSession,
+    board: str,
+    tg_id: int,
+    radius: int = 5,
+    week_key: Optional[str] = None,
+    fields: Sequence[str] = PROFILE_FIELDS
+) -> Dict:
+    """User's rank on a board plus `radius` rows above and below"""
+    if board == "all-time":
+        await all_time_index.ensure_loaded(session)
+        rank = all_time_index.rank(tg_id)
+        if rank is None:
+            # e.g. created by the bot process since the index was loaded
+            rank = await all_time_index.lookup(session, tg_id)
+            if rank is not None:
+                leaderboard_cache.bump()
+        if rank is None:
+            return {"rank": None, "items": []}
+        offset = max(rank - 1 - radius, 0)
+        items = await get_all_time_leaderboard(session, rank - offset + radius, offset, None, fields)
+        return {"rank": rank, "items": items}
+    
+    if board == "week":
+        if week_key is None:
+            week_key = get_week_key()
+        ranked = (
+            select(UserWeekTotal.tg_id, UserWeekTotal.tons.label("score"))
+            .join(User, User.tg_id == UserWeekTotal.tg_id)
+            .where(UserWeekTotal.week_key == week_key)
+            .where(UserWeekTotal.tons > 0)
+            .where(User.is_blocked == False)
+        ).subquery()
+        
+        async def get_page(limit, after):
+            return await get_week_leaderboard(session, week_key, limit, 0, after, fields)
+    elif board == "referrals":
+        ranked = (
+            select(ReferrerTotal.referrer_id.label("tg_id"), ReferrerTotal.referrals_tons_total.label("score"))
+            .join(User, User.tg_id == ReferrerTotal.referrer_id)
+            .where(ReferrerTotal.referrals_count > 0)
+            .where(User.is_blocked == False)
+        ).subquery()
+        
+        async def get_page(limit, after):
+            return await get_referrals_leaderboard(session, limit, 0, after, fields)
+    else:
+        raise ValueError(f"Unknown leaderboard: {board}")
+    
+    return await _around_keyset(session, ranked, tg_id, radius, get_page)
+
+
 async def get_user_stats(
     session: AsyncSession,
     tg_id: int
 ) -> Dict:
-    """Get user statistics: tons, referral stats, position in leaderboards"""
-    # User's total tons
-    total_tons_query = (
-        select(func.coalesce(func.sum(Donation.tons_amount), 0))
-        .where(Donation.tg_id == tg_id)
-    )
-    total_tons = (await session.execute(total_tons_query)).scalar() or 0
+    """
+    Get user statistics: tons, referral stats, position in leaderboards.
+
+    One round trip: every value is a scalar subquery over the pre-aggregated
+    totals (primary-key probes plus index range counts for the ranks).
+    When the in-memory ranking index is loaded (API process) the all-time rank
+    comes from it in O(log n) and is left out of the statement.
+    """
+    current_week_key = get_week_key()
     
-    # User's weekly tons
-    week_key = get_week_key()
-    week_tons_query = (
-        select(func.coalesce(func.sum(Donation.tons_amount), 0))
-        .where((Donation.tg_id == tg_id) & (Donation.week_key == week_key))
+    total_tons = func.coalesce(
+        select(UserTotal.tons_all_time).where(UserTotal.tg_id == tg_id).scalar_subquery(), 0
+    )
+    week_tons = func.coalesce(
+        select(UserWeekTotal.tons)
+        .where((UserWeekTotal.tg_id == tg_id) & (UserWeekTotal.week_key == current_week_key))
+        .scalar_subquery(), 0
+    )
+    # Weekly rank: place among users who have donations this week
+    users_above_week = (
+        select(func.count())
+        .select_from(UserWeekTotal)
+        .where(UserWeekTotal.week_key == current_week_key)
+        .where(UserWeekTotal.tons > week_tons)
+        .scalar_subquery()
     )
-    week_tons = (await session.execute(week_tons_query)).scalar() or 0
-    
     # Referral stats
-    referrals_query = (
-        select(
-            func.count(User.tg_id).label("referrals_count"),
-            func.coalesce(func.sum(Donation.tons_amount), 0).label("referrals_tons_total")
-        )
-        .select_from(User)
-        .outerjoin(Donation, User.tg_id == Donation.tg_id)
-        .where(User.referrer_id == tg_id)
-        .group_by(User.referrer_id)
+    referrals_count = (
+        select(ReferrerTotal.referrals_count)
+        .where(ReferrerTotal.referrer_id == tg_id)
+        .scalar_subquery()
+    )
+    referrals_tons_total = (
+        select(ReferrerTotal.referrals_tons_total)
+        .where(ReferrerTotal.referrer_id == tg_id)
+        .scalar_subquery()
     )
-    ref_result = await session.execute(referrals_query)
-    ref_row = ref_result.first()
+    columns = [
+        total_tons.label("tons_all_time"),
+        week_tons.label("tons_week"),
+        users_above_week.label("users_above_week"),
+        referrals_count.label("referrals_count"),
+        referrals_tons_total.label("referrals_tons_total")
+    ]
+    if not all_time_index.loaded:
+        users_above = (
+            select(func.count())
+            .select_from(UserTotal)
+            .join(User, User.tg_id == UserTotal.tg_id)
+            .where(UserTotal.tons_all_time > total_tons)
+            .where(User.is_blocked == False)
+            .scalar_subquery()
+        )
+        columns.append(users_above.label("users_above"))
+    
+    row = (await session.execute(select(*columns))).one()
     
-    referrals_count = int(ref_row.referrals_count) if ref_row else 0
-    referrals_tons_total = float(ref_row.referrals_tons_total) if ref_row else 0.0
+    users_above = None
+    if all_time_index.loaded:
+        if float(row.tons_all_time or 0) > 0:
+            users_above = all_time_index.count_above(row.tons_all_time)
+    else:
+        users_above = row.users_above
+    
+    return _stats_dict(
+        tg_id,
+        current_week_key,
+        row.tons_all_time,
+        row.tons_week,
+        users_above,
+        row.users_above_week,
+        row.referrals_count,
+        row.referrals_tons_total
+    )
+
+
+def _stats_dict(
+    tg_id: int,
+    week_key: str,
+    total_tons,
+    week_tons,
+    users_above,
+    users_above_week,
+    referrals_count,
+    referrals_tons_total
+) -> Dict:
+    """Stats response for one user; ranks are shared on ties (1 + users strictly above)"""
+    total_tons = total_tons or 0
+    week_tons = week_tons or 0
     
-    # Calculate all-time rank
     rank_all_time = 0
     if float(total_tons) > 0:
-        rank_query = (
-            select(func.count(User.tg_id))
-            .select_from(User)
-            .outerjoin(Donation, User.tg_id == Donation.tg_id)
-            .where(User.is_blocked == False)
-            .group_by(User.tg_id)
-            .having(func.coalesce(func.sum(Donation.tons_amount), 0) > total_tons)
-        )
-        rank_result = await session.execute(rank_query)
-        users_above = len(rank_result.all())
-        rank_all_time = users_above + 1
+        rank_all_time = (users_above or 0) + 1
     
-    # Weekly rank: place among users who have donations this week
-    current_week_key = get_week_key()
     rank_week = 0
     if float(week_tons) > 0:
-        week_rank_query = (
-            select(func.count())
-            .select_from(
-                select(Donation.tg_id)
-                .where(Donation.week_key == current_week_key)
-                .group_by(Donation.tg_id)
-                .having(func.coalesce(func.sum(Donation.tons_amount), 0) > week_tons)
-                .subquery()
-            )
-        )
-        week_rank_result = await session.execute(week_rank_query)
-        users_above_week = week_rank_result.scalar() or 0
-        rank_week = users_above_week + 1
+        rank_week = (users_above_week or 0) + 1
     
     return {
         "tg_id": tg_id,
@@ -290,9 +574,89 @@ async def get_user_stats(
         "tons_week": float(week_tons),
         "rank_all_time": rank_all_time,
         "rank_week": rank_week,
-        "week_key": current_week_key,
-        "referrals_count": referrals_count,
-        "referrals_tons_total": float(referrals_tons_total),
+        "week_key": week_key,
+        "referrals_count": int(referrals_count or 0),
+        "referrals_tons_total": float(referrals_tons_total or 0),
         "referral_link": f"{settings.mini_app_url}?startapp=ref_{tg_id}"
     }
 
+
+async def get_users_stats(
+    session: AsyncSession,
+    tg_ids: List[int]
+) -> Dict[int, Dict]:
+    """
+    get_user_stats for many users at once: {tg_id: stats}, same shape per user.
+
+    One statement for the whole set: PK outer joins of the totals tables plus,
+    per row, index range counts for the ranks (all-time ranks come from the
+    in-memory index when loaded). Unknown tg_ids get zero stats.
+    """
+    tg_ids = list(dict.fromkeys(tg_ids))
+    current_week_key = get_week_key()
+    if not tg_ids:
+        return {}
+    
+    week_alias = aliased(UserWeekTotal)
+    total_alias = aliased(UserTotal)
+    users_above_week = (
+        select(func.count())
+        .select_from(week_alias)
+        .where(week_alias.week_key == current_week_key)
+        .where(week_alias.tons > UserWeekTotal.tons)
+        .correlate(UserWeekTotal)
+        .scalar_subquery()
+    )
+    columns = [
+        User.tg_id,
+        UserTotal.tons_all_time,
+        UserWeekTotal.tons.label("tons_week"),
+        users_above_week.label("users_above_week"),
+        ReferrerTotal.referrals_count,
+        ReferrerTotal.referrals_tons_total
+    ]
+    if not all_time_index.loaded:
+        users_above = (
+            select(func.count())
+            .select_from(total_alias)
+            .join(User, User.tg_id == total_alias.tg_id)
+            .where(total_alias.tons_all_time > UserTotal.tons_all_time)
+            .where(User.is_blocked == False)
+            .correlate(UserTotal)
+            .scalar_subquery()
+        )
+        columns.append(users_above.label("users_above"))
+    
+    query = (
+        select(*columns)
+        .outerjoin(UserTotal, UserTotal.tg_id == User.tg_id)
+        .outerjoin(
+            UserWeekTotal,
+            (UserWeekTotal.tg_id == User.tg_id) & (UserWeekTotal.week_key == current_week_key)
+        )
+        .outerjoin(ReferrerTotal, ReferrerTotal.referrer_id == User.tg_id)
+        .where(User.tg_id.in_(tg_ids))
+    )
+    rows = {row.tg_id: row for row in (await session.execute(query)).all()}
+    
+    stats = {}
+    for tg_id in tg_ids:
+        row = rows.get(tg_id)
+        if row is None:
+            stats[tg_id] = _stats_dict(tg_id, current_week_key, 0, 0, None, None, 0, 0)
+            continue
+        if all_time_index.loaded:
+            users_above = all_time_index.count_above(row.tons_all_time) if float(row.tons_all_time or 0) > 0 else None
+        else:
+            users_above = row.users_above
+        stats[tg_id] = _stats_dict(
+            tg_id,
+            current_week_key,
+            row.tons_all_time,
+            row.tons_week,
+            users_above,
+            row.users_above_week,
+            row.referrals_count,
+            row.referrals_tons_total
+        )
+    return stats
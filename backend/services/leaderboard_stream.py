@@ -0,0 +1,82 @@
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESYNC_FRAME = b"event: resync\ndata: {}\n\n"
+
+
+class Subscriber:
+    """One streaming connection: a bounded queue of ready-to-send frames"""
+    
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+    
+    def offer(self, frame: bytes) -> None:
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Slow consumer: discard its backlog and tell it to reload instead
+            self.dropped += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_FRAME)
+
+
+class LeaderboardHub:
+    """
+    Fan-out of leaderboard changes to streaming (SSE) subscribers.
+
+    Changes published within `window` seconds are coalesced per (board, tg_id, op),
+    keeping the latest, and sent as a single frame. The frame is serialized once
+    and the same bytes are queued for every subscriber, so a burst of N activations
+    costs one encode and one put per connection.
+    """
+    
+    def __init__(self, window: float = 0.25, queue_size: int = 32):
+        self._window = window
+        self._queue_size = queue_size
+        self._subscribers: Set[Subscriber] = set()
+        self._pending: Dict[Tuple[str, int, str], Dict] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+    
+    def __len__(self) -> int:
+        return len(self._subscribers)
+    
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(self._queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+    
+    def publish(self, board: str, change: Dict) -> None:
+        if not self._subscribers:
+            return
+        self._pending[(board, change["tg_id"], change["op"])] = {"board": board, **change}
+        if self._flush_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._flush_handle = loop.call_later(self._window, self.flush)
+    
+    def flush(self) -> None:
+        self._flush_handle = None
+        if not self._pending:
+            return
+        changes: List[Dict] = list(self._pending.values())
+        self._pending.clear()
+        frame = b"event: changes\ndata: " + json.dumps(
+            {"changes": changes}, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8") + b"\n\n"
+        for subscriber in self._subscribers:
+            subscriber.offer(frame)
+
+
+# Global instance
+leaderboard_hub = LeaderboardHub()
@@ -6,6 +6,7 @@ import uuid
 from backend.models import Payment, Donation, User
 from backend.rate_provider import rate_provider
 from backend.services.leaderboard_service import get_week_key
+from backend.services import totals_service, leaderboard_events
 import logging
 
 logger = logging.getLogger(__name__)
@@ -157,8 +158,14 @@ async def activate_charts(
     )
     session.add(donation)
     
+    # Pre-aggregated totals are updated in the same transaction as the donation
+    totals = await totals_service.record_donation(session, donation, user.referrer_id)
+    
     await session.commit()
     
+    # Update in-memory ranking, caches and change feeds (only once the donation is committed)
+    leaderboard_events.donation_activated(totals)
+    
     logger.info(f"User {tg_id} activated {amount} charts. Remaining balance: {user.balance_charts}")
     
     return {
@@ -0,0 +1,102 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Sequence, Tuple
+from backend.config import settings
+from backend.models import User
+import time
+
+# Fields shown on leaderboard rows, in response order
+PROFILE_FIELDS = (
+    "username",
+    "first_name",
+    "display_name",
+    "photo_url",
+    "custom_title",
+    "custom_text",
+    "custom_link",
+)
+
+# Everything a client may ask for with fields=; has_details tells a list whether
+# the profile modal has a description or link without shipping them
+FIELD_COLUMNS = {
+    "username": User.username,
+    "first_name": User.first_name,
+    "display_name": User.display_name,
+    "photo_url": User.photo_url,
+    "custom_title": User.custom_title,
+    "custom_text": User.custom_text,
+    "custom_link": User.custom_link,
+    "has_details": or_(User.custom_text.isnot(None), User.custom_link.isnot(None)),
+}
+
+
+class ProfileCache:
+    """
+    Process-local tg_id -> leaderboard profile fields (LRU with TTL).
+
+    Rankings are computed over narrow (tg_id, score) rows; only the rows of the
+    requested page are hydrated from here, with one primary-key query for misses
+    that selects just the requested fields (entries fill up as other fields are asked for).
+    Invalidated on profile updates; the TTL bounds staleness from other
+    processes (the bot updates usernames too).
+    Blocked users are never cached, so they come back as missing.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[int, Tuple[float, Dict]]" = OrderedDict()
+
+    def invalidate(self, tg_id: int) -> None:
+        self._entries.pop(tg_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def get_many(
+        self,
+        session: AsyncSession,
+        tg_ids: Iterable[int],
+        fields: Sequence[str] = PROFILE_FIELDS
+    ) -> Dict[int, Dict]:
+        """Profiles (at least `fields`) of the given non-blocked users; unknown or blocked tg_ids are absent"""
+        now = time.monotonic()
+        profiles: Dict[int, Dict] = {}
+        missing: List[int] = []
+        for tg_id in tg_ids:
+            entry = self._entries.get(tg_id)
+            if (
+                entry is not None
+                and now - entry[0] < settings.profile_cache_ttl_seconds
+                and all(field in entry[1] for field in fields)
+            ):
+                self._entries.move_to_end(tg_id)
+                profiles[tg_id] = entry[1]
+            else:
+                missing.append(tg_id)
+        
+        if missing:
+            query = (
+                select(User.tg_id, *(FIELD_COLUMNS[field].label(field) for field in fields))
+                .where(User.tg_id.in_(missing))
+                .where(User.is_blocked == False)
+            )
+            for row in (await session.execute(query)).all():
+                profile = {field: getattr(row, field) for field in fields}
+                if "has_details" in profile:
+                    profile["has_details"] = bool(profile["has_details"])
+                cached_at = now
+                entry = self._entries.get(row.tg_id)
+                if entry is not None and now - entry[0] < settings.profile_cache_ttl_seconds:
+                    profile = {**entry[1], **profile}
+                    cached_at = entry[0]
+                profiles[row.tg_id] = profile
+                self._entries[row.tg_id] = (cached_at, profile)
+                self._entries.move_to_end(row.tg_id)
+            while len(self._entries) > settings.profile_cache_size:
+                self._entries.popitem(last=False)
+        
+        return profiles
+
+
+# Global instance
+profile_cache = ProfileCache()
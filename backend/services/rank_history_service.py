@@ -0,0 +1,183 @@
+"""Periodic rank snapshots for "position over time" charts"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, desc
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from backend.config import settings
+from backend.models import RankSnapshot, User, UserWeekTotal
+from backend.services.leaderboard_service import get_week_key
+from backend.services.ranking_index import all_time_index
+import sys
+import logging
+
+logger = logging.getLogger(__name__)
+
+BOARDS = ("all-time", "week")
+MAX_HISTORY_POINTS = 64
+
+
+def _pack(values: array) -> bytes:
+    """Serialize as little-endian regardless of platform"""
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpack(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def build_snapshot(board: str, ranked: Iterable[int], week_key: Optional[str] = None) -> RankSnapshot:
+    """Snapshot from tg_ids in rank order (first = rank 1)"""
+    pairs = sorted((tg_id, rank) for rank, tg_id in enumerate(ranked, start=1))
+    tg_ids = array("q", (tg_id for tg_id, _ in pairs))
+    ranks = array("I", (rank for _, rank in pairs))
+    return RankSnapshot(
+        board=board,
+        week_key=week_key,
+        taken_at=datetime.utcnow(),
+        users_count=len(pairs),
+        tg_ids=_pack(tg_ids),
+        ranks=_pack(ranks)
+    )
+
+
+async def take_snapshots(session: AsyncSession) -> None:
+    """Record current all-time and weekly ranks of every user with a non-zero total"""
+    await all_time_index.ensure_loaded(session)
+    ranked_all_time = [tg_id for tg_id, _ in all_time_index.page(0, all_time_index.count_above(0))]
+    session.add(build_snapshot("all-time", ranked_all_time))
+    
+    week_key = get_week_key()
+    ranked_week = (await session.execute(
+        select(UserWeekTotal.tg_id)
+        .join(User, User.tg_id == UserWeekTotal.tg_id)
+        .where(UserWeekTotal.week_key == week_key)
+        .where(UserWeekTotal.tons > 0)
+        .where(User.is_blocked == False)
+        .order_by(desc(UserWeekTotal.tons), UserWeekTotal.tg_id)
+    )).scalars().all()
+    session.add(build_snapshot("week", ranked_week, week_key))
+    
+    await session.commit()
+    logger.info(f"Rank snapshots taken: {len(ranked_all_time)} all-time, {len(ranked_week)} week")
+
+
+async def take_snapshots_if_due(session: AsyncSession) -> bool:
+    """Take snapshots unless the last ones are newer than settings.rank_snapshot_hours"""
+    last = (await session.execute(
+        select(RankSnapshot.taken_at)
+        .where(RankSnapshot.board == "all-time")
+        .order_by(desc(RankSnapshot.taken_at))
+        .limit(1)
+    )).scalar_one_or_none()
+    if last is not None and datetime.utcnow() - last < timedelta(hours=settings.rank_snapshot_hours):
+        return False
+    await take_snapshots(session)
+    return True
+
+
+class SnapshotBlobs:
+    """
+    Raw snapshot blobs (immutable), most recently used kept in memory.
+    Bounded by entry count and by settings.rank_history_cache_mb (~12 bytes per ranked user).
+    Lookups bisect a memoryview of the blob, nothing is decoded or copied.
+    """
+    
+    def __init__(self, max_entries: int = MAX_HISTORY_POINTS):
+        self._entries: "OrderedDict[int, Tuple[bytes, bytes]]" = OrderedDict()
+        self._max_entries = max_entries
+        self._size = 0
+    
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries
+    
+    def get(self, snapshot_id: int) -> Optional[Tuple[bytes, bytes]]:
+        entry = self._entries.get(snapshot_id)
+        if entry is not None:
+            self._entries.move_to_end(snapshot_id)
+        return entry
+    
+    def put(self, snapshot_id: int, tg_ids: bytes, ranks: bytes) -> Tuple[bytes, bytes]:
+        entry = (bytes(tg_ids), bytes(ranks))
+        if snapshot_id not in self._entries:
+            self._size += len(entry[0]) + len(entry[1])
+        self._entries[snapshot_id] = entry
+        max_size = settings.rank_history_cache_mb * 1024 * 1024
+        while len(self._entries) > self._max_entries or (self._size > max_size and len(self._entries) > 1):
+            _, (old_ids, old_ranks) = self._entries.popitem(last=False)
+            self._size -= len(old_ids) + len(old_ranks)
+        return entry
+
+
+# Global instance
+snapshot_blobs = SnapshotBlobs()
+
+
+def _view(typecode: str, data: bytes):
+    """Little-endian blob as an indexable sequence (a zero-copy memoryview on little-endian hosts)"""
+    if sys.byteorder == "little":
+        return memoryview(data).cast(typecode)
+    return _unpack(typecode, data)
+
+
+def rank_in(tg_ids: bytes, ranks: bytes, tg_id: int) -> Optional[int]:
+    """Binary search for a user's rank in one snapshot's blobs"""
+    ids = _view("q", tg_ids)
+    i = bisect_left(ids, tg_id)
+    if i < len(ids) and ids[i] == tg_id:
+        return _view("I", ranks)[i]
+    return None
+
+
+async def get_rank_history(
+    session: AsyncSession,
+    tg_id: int,
+    board: str = "all-time",
+    limit: int = 30
+) -> List[Dict]:
+    """
+    User's rank in the latest `limit` snapshots of a board, oldest first (rank None = unranked).
+    `limit` is capped at the blob cache size so repeated requests are served from memory.
+    """
+    if board not in BOARDS:
+        raise ValueError(f"Unknown board: {board}")
+    limit = max(1, min(limit, MAX_HISTORY_POINTS, snapshot_blobs.max_entries))
+    
+    snapshots = (await session.execute(
+        select(RankSnapshot.id, RankSnapshot.week_key, RankSnapshot.taken_at, RankSnapshot.users_count)
+        .where(RankSnapshot.board == board)
+        .order_by(desc(RankSnapshot.taken_at))
+        .limit(limit)
+    )).all()
+    
+    # Blobs only for snapshots not cached yet
+    blobs_by_id = {row.id: snapshot_blobs.get(row.id) for row in snapshots}
+    missing = [snapshot_id for snapshot_id, entry in blobs_by_id.items() if entry is None]
+    if missing:
+        blobs = await session.execute(
+            select(RankSnapshot.id, RankSnapshot.tg_ids, RankSnapshot.ranks)
+            .where(RankSnapshot.id.in_(missing))
+        )
+        for row in blobs.all():
+            blobs_by_id[row.id] = snapshot_blobs.put(row.id, row.tg_ids, row.ranks)
+    
+    history = []
+    for row in reversed(snapshots):
+        tg_ids, ranks = blobs_by_id[row.id]
+        history.append({
+            "taken_at": row.taken_at.isoformat(),
+            "week_key": row.week_key,
+            "rank": rank_in(tg_ids, ranks, tg_id),
+            "users_count": row.users_count
+        })
+    return history
@@ -0,0 +1,169 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from bisect import bisect_left, bisect_right, insort
+from decimal import Decimal
+from typing import Dict, List, Optional, Set, Tuple
+from backend.models import User, UserTotal
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+CENTS = Decimal("0.01")
+
+
+def to_tons(value) -> Decimal:
+    """Normalize an amount to the precision of Donation.tons_amount (Numeric(10, 2))"""
+    return Decimal(str(value or 0)).quantize(CENTS)
+
+
+class RankingIndex:
+    """
+    Process-local all-time ranking.
+
+    Keeps one sorted array of (-tons_total, tg_id) keys, i.e. the exact order of
+    the all-time leaderboard, plus a tg_id -> tons_total map.
+    - rank lookup: bisect, O(log n)
+    - page read: slice, O(log n + k)
+    - score update: bisect + list insert/pop (memmove), no SQL aggregate
+
+    Loaded once from the database at startup and updated incrementally after
+    every committed Donation. Writes from other processes (the polling bot,
+    scripts) and blocking/unblocking are picked up by reconcile().
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[Decimal, int]] = []
+        self._scores: Dict[int, Decimal] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._touched: Optional[Set[int]] = None  # Users changed in-process while reconcile() reads
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    async def _read_scores(self, session: AsyncSession, tg_id: Optional[int] = None) -> Dict[int, Decimal]:
+        """tg_id -> tons_total of every non-blocked user (or just `tg_id`) in the database"""
+        query = (
+            select(
+                User.tg_id,
+                func.coalesce(UserTotal.tons_all_time, 0).label("tons_total")
+            )
+            .outerjoin(UserTotal, User.tg_id == UserTotal.tg_id)
+            .where(User.is_blocked == False)
+        )
+        if tg_id is not None:
+            query = query.where(User.tg_id == tg_id)
+        rows = (await session.execute(query)).all()
+        return {row.tg_id: to_tons(row.tons_total) for row in rows}
+
+    async def load(self, session: AsyncSession) -> None:
+        """(Re)build the index from the database"""
+        async with self._lock:
+            scores = await self._read_scores(session)
+            self._scores = scores
+            self._keys = sorted((-tons, tg_id) for tg_id, tons in scores.items())
+            self._loaded = True
+            logger.info(f"Ranking index loaded: {len(self._keys)} users")
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        if not self._loaded:
+            await self.load(session)
+
+    async def reconcile(self, session: AsyncSession) -> int:
+        """
+        Diff the index against the database: add users it misses (e.g. created by the bot),
+        fix changed totals and drop blocked or deleted users. Returns the number of changes.
+        In-process updates made while the database is read are newer and kept.
+        """
+        if not self._loaded:
+            await self.load(session)
+            return 0
+        async with self._lock:
+            self._touched = set()
+            try:
+                scores = await self._read_scores(session)
+            finally:
+                touched, self._touched = self._touched, None
+
+            changes = 0
+            for tg_id in [tg_id for tg_id in self._scores if tg_id not in scores and tg_id not in touched]:
+                self.remove(tg_id)
+                changes += 1
+            for tg_id, tons in scores.items():
+                if tg_id not in touched and self._scores.get(tg_id) != tons:
+                    self.set_score(tg_id, tons)
+                    changes += 1
+            if changes:
+                logger.info(f"Ranking index reconciled: {changes} changes")
+            return changes
+
+    async def lookup(self, session: AsyncSession, tg_id: int) -> Optional[int]:
+        """Rank of a user missing from the index, read from the database (and added to the index)"""
+        tons = (await self._read_scores(session, tg_id)).get(tg_id)
+        if tons is None:
+            return None
+        self.set_score(tg_id, tons)
+        return self.rank(tg_id)
+
+    def score(self, tg_id: int) -> Optional[Decimal]:
+        return self._scores.get(tg_id)
+
+    def set_score(self, tg_id: int, tons_total) -> None:
+        """Insert user or move them to a new total"""
+        tons_total = to_tons(tons_total)
+        if self._touched is not None:
+            self._touched.add(tg_id)
+        old = self._scores.get(tg_id)
+        if old is not None:
+            if old == tons_total:
+                return
+            self._remove_key(old, tg_id)
+        self._scores[tg_id] = tons_total
+        insort(self._keys, (-tons_total, tg_id))
+
+    def add_user(self, tg_id: int) -> None:
+        """Register a user with zero total if not ranked yet"""
+        if tg_id not in self._scores:
+            self.set_score(tg_id, 0)
+
+    def remove(self, tg_id: int) -> None:
+        if self._touched is not None:
+            self._touched.add(tg_id)
+        old = self._scores.pop(tg_id, None)
+        if old is not None:
+            self._remove_key(old, tg_id)
+
+    def rank(self, tg_id: int) -> Optional[int]:
+        """1-based position of user in the ranking"""
+        tons = self._scores.get(tg_id)
+        if tons is None:
+            return None
+        return bisect_left(self._keys, (-tons, tg_id)) + 1
+
+    def count_above(self, tons_total) -> int:
+        """Number of users with a strictly greater total"""
+        return bisect_left(self._keys, (-to_tons(tons_total), float("-inf")))
+
+    def position_after(self, tons_total, tg_id: int) -> int:
+        """Number of entries ranked at or above (tons_total, tg_id); offset of the next page"""
+        return bisect_right(self._keys, (-to_tons(tons_total), tg_id))
+
+    def page(self, offset: int, limit: int) -> List[Tuple[int, Decimal]]:
+        """Return [(tg_id, tons_total)] for ranks offset+1 .. offset+limit"""
+        offset = max(offset, 0)
+        return [(tg_id, -neg) for neg, tg_id in self._keys[offset:offset + max(limit, 0)]]
+
+    def _remove_key(self, tons: Decimal, tg_id: int) -> None:
+        key = (-tons, tg_id)
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+
+# Global instance
+all_time_index = RankingIndex()
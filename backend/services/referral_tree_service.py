@@ -0,0 +1,143 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func, exists, insert
+from typing import Dict, Optional
+from backend.database import dialect_insert
+from backend.config import settings
+from backend.models import User, UserTotal, ReferralClosure, ReferralLevelTotal, ReferralNetworkTotal
+
+
+async def attach(
+    session: AsyncSession,
+    tg_id: int,
+    referrer_id: int,
+    tons_all_time=0
+) -> None:
+    """
+    Add a newly attached user under `referrer_id` and every ancestor of the referrer
+    (up to settings.referral_network_depth levels) and count them in each ancestor's
+    level and network totals. Runs in the caller's transaction.
+    """
+    ancestors = (await session.execute(
+        select(ReferralClosure.ancestor_id, ReferralClosure.depth)
+        .where(ReferralClosure.descendant_id == referrer_id)
+        .where(ReferralClosure.depth < settings.referral_network_depth)
+    )).all()
+    levels = [(referrer_id, 1)] + [(row.ancestor_id, row.depth + 1) for row in ancestors]
+    
+    await session.execute(insert(ReferralClosure), [
+        {"ancestor_id": ancestor_id, "descendant_id": tg_id, "depth": depth}
+        for ancestor_id, depth in levels
+    ])
+    
+    level_insert = dialect_insert(session, ReferralLevelTotal)
+    await session.execute(
+        level_insert.on_conflict_do_update(
+            index_elements=[ReferralLevelTotal.ancestor_id, ReferralLevelTotal.depth],
+            set_={
+                "members": ReferralLevelTotal.members + 1,
+                "tons_total": func.round(ReferralLevelTotal.tons_total + level_insert.excluded.tons_total, 2)
+            }
+        ),
+        [
+            {"ancestor_id": ancestor_id, "depth": depth, "members": 1, "tons_total": tons_all_time}
+            for ancestor_id, depth in levels
+        ]
+    )
+    
+    network_insert = dialect_insert(session, ReferralNetworkTotal)
+    await session.execute(
+        network_insert.on_conflict_do_update(
+            index_elements=[ReferralNetworkTotal.ancestor_id],
+            set_={
+                "network_size": ReferralNetworkTotal.network_size + 1,
+                "network_tons": func.round(ReferralNetworkTotal.network_tons + network_insert.excluded.network_tons, 2)
+            }
+        ),
+        [
+            {"ancestor_id": ancestor_id, "network_size": 1, "network_tons": tons_all_time}
+            for ancestor_id, _ in levels
+        ]
+    )
+
+
+async def add_donation(session: AsyncSession, tg_id: int, tons_amount) -> None:
+    """Add a referred user's donation to the level and network totals of all their ancestors"""
+    in_tree = select(ReferralClosure.ancestor_id).where(ReferralClosure.descendant_id == tg_id)
+    await session.execute(
+        update(ReferralLevelTotal)
+        .where(exists().where(
+            (ReferralClosure.descendant_id == tg_id)
+            & (ReferralClosure.ancestor_id == ReferralLevelTotal.ancestor_id)
+            & (ReferralClosure.depth == ReferralLevelTotal.depth)
+        ))
+        .values(tons_total=func.round(ReferralLevelTotal.tons_total + tons_amount, 2))
+        .execution_options(synchronize_session=False)
+    )
+    await session.execute(
+        update(ReferralNetworkTotal)
+        .where(ReferralNetworkTotal.ancestor_id.in_(in_tree))
+        .values(network_tons=func.round(ReferralNetworkTotal.network_tons + tons_amount, 2))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def get_referral_tree(
+    session: AsyncSession,
+    tg_id: int,
+    depth: Optional[int] = None,
+    limit: int = 50,
+    offset: int = 0
+) -> Dict:
+    """
+    User's referral tree: network totals and per-level size and tons.
+    With `depth`, also lists the members of that level.
+    """
+    levels = (await session.execute(
+        select(ReferralLevelTotal.depth, ReferralLevelTotal.members, ReferralLevelTotal.tons_total)
+        .where(ReferralLevelTotal.ancestor_id == tg_id)
+        .order_by(ReferralLevelTotal.depth)
+    )).all()
+    
+    tree = {
+        "tg_id": tg_id,
+        "network_size": sum(level.members for level in levels),
+        "network_tons": float(sum(level.tons_total for level in levels)),
+        "levels": [
+            {"depth": level.depth, "members": level.members, "tons_total": float(level.tons_total)}
+            for level in levels
+        ]
+    }
+    
+    if depth is not None:
+        query = (
+            select(
+                User.tg_id,
+                User.username,
+                User.first_name,
+                User.display_name,
+                User.photo_url,
+                func.coalesce(UserTotal.tons_all_time, 0).label("tons_total")
+            )
+            .select_from(ReferralClosure)
+            .join(User, User.tg_id == ReferralClosure.descendant_id)
+            .outerjoin(UserTotal, UserTotal.tg_id == ReferralClosure.descendant_id)
+            .where(ReferralClosure.ancestor_id == tg_id)
+            .where(ReferralClosure.depth == depth)
+            .order_by(ReferralClosure.descendant_id)
+            .limit(limit)
+            .offset(offset)
+        )
+        rows = (await session.execute(query)).all()
+        tree["members"] = [
+            {
+                "tg_id": row.tg_id,
+                "username": row.username,
+                "first_name": row.first_name,
+                "display_name": row.display_name,
+                "photo_url": row.photo_url,
+                "tons_total": float(row.tons_total)
+            }
+            for row in rows
+        ]
+    
+    return tree
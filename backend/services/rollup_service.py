@@ -0,0 +1,127 @@
+"""Hourly and daily per-user donation buckets for arbitrary-window leaderboards"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func, union_all, and_, or_
+from datetime import date, datetime, time, timedelta
+from typing import List, NamedTuple, Optional, Tuple
+from backend.database import dialect_insert
+from backend.config import settings
+from backend.models import Donation, UserDayTotal, UserHourTotal
+import pytz
+
+PERIODS = ("day", "week", "month", "rolling_7d", "rolling_30d")
+ROLLING_DAYS = {"rolling_7d": 7, "rolling_30d": 30}
+
+
+class PeriodWindow(NamedTuple):
+    """Buckets covering a period: whole local days plus UTC hours at the edges"""
+    since: datetime  # UTC
+    days: Optional[Tuple[date, date]]  # inclusive
+    hours: List[Tuple[datetime, datetime]]  # half-open UTC ranges
+
+
+def local_day(dt: datetime) -> date:
+    """Calendar day of a naive UTC datetime in settings.timezone"""
+    tz = pytz.timezone(settings.timezone)
+    return dt.replace(tzinfo=pytz.UTC).astimezone(tz).date()
+
+
+def day_start(day: date) -> datetime:
+    """Naive UTC datetime of local midnight of `day`"""
+    tz = pytz.timezone(settings.timezone)
+    return tz.localize(datetime.combine(day, time())).astimezone(pytz.UTC).replace(tzinfo=None)
+
+
+def hour_of(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def period_window(period: str, now: Optional[datetime] = None) -> PeriodWindow:
+    """
+    Buckets to sum for a period ending now.
+    Calendar periods are whole local days; rolling windows start on an hour boundary
+    and use hour buckets only for the partial days at both ends.
+    Raises ValueError for an unknown period.
+    """
+    if now is None:
+        now = datetime.utcnow()
+    today = local_day(now)
+    
+    if period in ("day", "week", "month"):
+        if period == "day":
+            first = today
+        elif period == "week":
+            first = today - timedelta(days=today.weekday())
+        else:
+            first = today.replace(day=1)
+        return PeriodWindow(since=day_start(first), days=(first, today), hours=[])
+    
+    if period not in ROLLING_DAYS:
+        raise ValueError(f"Unknown period: {period}")
+    
+    since = hour_of(now - timedelta(days=ROLLING_DAYS[period]))
+    first_full = local_day(since) + timedelta(days=1)
+    last_full = today - timedelta(days=1)
+    hours = [
+        (since, day_start(first_full)),
+        (day_start(today), hour_of(now) + timedelta(hours=1))
+    ]
+    days = (first_full, last_full) if first_full <= last_full else None
+    return PeriodWindow(since=since, days=days, hours=hours)
+
+
+def window_totals(window: PeriodWindow):
+    """Subquery (tg_id, score): per-user sum of the window's buckets"""
+    parts = []
+    if window.days is not None:
+        parts.append(
+            select(UserDayTotal.tg_id, UserDayTotal.tons)
+            .where(UserDayTotal.day.between(*window.days))
+        )
+    if window.hours:
+        parts.append(
+            select(UserHourTotal.tg_id, UserHourTotal.tons)
+            .where(or_(*(
+                and_(UserHourTotal.hour >= start, UserHourTotal.hour < end)
+                for start, end in window.hours
+            )))
+        )
+    buckets = union_all(*parts).subquery() if len(parts) > 1 else parts[0].subquery()
+    return (
+        select(buckets.c.tg_id, func.round(func.sum(buckets.c.tons), 2).label("score"))
+        .group_by(buckets.c.tg_id)
+    ).subquery()
+
+
+async def record_donation(session: AsyncSession, donation: Donation) -> None:
+    """Add a donation to its hour and day buckets (caller's transaction)"""
+    hour_insert = dialect_insert(session, UserHourTotal).values(
+        hour=hour_of(donation.created_at),
+        tg_id=donation.tg_id,
+        tons=donation.tons_amount
+    )
+    await session.execute(
+        hour_insert.on_conflict_do_update(
+            index_elements=[UserHourTotal.hour, UserHourTotal.tg_id],
+            set_={"tons": func.round(UserHourTotal.tons + hour_insert.excluded.tons, 2)}
+        )
+    )
+    
+    day_insert = dialect_insert(session, UserDayTotal).values(
+        day=local_day(donation.created_at),
+        tg_id=donation.tg_id,
+        tons=donation.tons_amount
+    )
+    await session.execute(
+        day_insert.on_conflict_do_update(
+            index_elements=[UserDayTotal.day, UserDayTotal.tg_id],
+            set_={"tons": func.round(UserDayTotal.tons + day_insert.excluded.tons, 2)}
+        )
+    )
+
+
+async def prune_hour_totals(session: AsyncSession) -> int:
+    """Delete hour buckets older than any rolling window needs"""
+    cutoff = datetime.utcnow() - timedelta(days=settings.rollup_hour_retention_days)
+    result = await session.execute(delete(UserHourTotal).where(UserHourTotal.hour < cutoff))
+    await session.commit()
+    return result.rowcount
@@ -0,0 +1,154 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from decimal import Decimal
+from typing import NamedTuple, Optional, Tuple
+import random
+from backend.database import dialect_insert
+from backend.config import settings
+from backend.models import CollectedCounter, Donation, ReferrerTotal, UserTotal, UserWeekTotal
+from backend.services import referral_tree_service, rollup_service, trending_service
+
+
+class DonationTotals(NamedTuple):
+    """Totals affected by a donation, as of after it was recorded"""
+    tg_id: int
+    week_key: str
+    tons_amount: Decimal
+    tons_all_time: Decimal
+    tons_week: Decimal
+    first_of_week: bool
+    referrer_id: Optional[int] = None
+    referrals_tons_total: Optional[Decimal] = None
+
+
+async def record_donation(
+    session: AsyncSession,
+    donation: Donation,
+    referrer_id: Optional[int] = None
+) -> DonationTotals:
+    """
+    Upsert pre-aggregated totals for a new donation and return the new values.
+    Runs in the caller's transaction, so totals commit together with the Donation.
+    Sums are rounded to cents so that SQLite (REAL storage) keeps exact, comparable
+    keys for keyset pagination.
+    """
+    totals_insert = dialect_insert(session, UserTotal).values(
+        tg_id=donation.tg_id,
+        tons_all_time=donation.tons_amount,
+        last_donation_at=donation.created_at
+    )
+    tons_all_time = (await session.execute(
+        totals_insert.on_conflict_do_update(
+            index_elements=[UserTotal.tg_id],
+            set_={
+                "tons_all_time": func.round(UserTotal.tons_all_time + totals_insert.excluded.tons_all_time, 2),
+                "last_donation_at": totals_insert.excluded.last_donation_at
+            }
+        ).returning(UserTotal.tons_all_time)
+    )).scalar_one()
+    
+    week_insert = dialect_insert(session, UserWeekTotal).values(
+        week_key=donation.week_key,
+        tg_id=donation.tg_id,
+        tons=donation.tons_amount
+    )
+    tons_week = (await session.execute(
+        week_insert.on_conflict_do_update(
+            index_elements=[UserWeekTotal.week_key, UserWeekTotal.tg_id],
+            set_={"tons": func.round(UserWeekTotal.tons + week_insert.excluded.tons, 2)}
+        ).returning(UserWeekTotal.tons)
+    )).scalar_one()
+    
+    # Hour/day buckets for period leaderboards
+    await rollup_service.record_donation(session, donation)
+    # Decayed score for the trending board
+    await trending_service.record_donation(session, donation)
+    
+    # Total collected: add to a random shard row
+    counter_insert = dialect_insert(session, CollectedCounter).values(
+        shard=random.randrange(settings.collected_counter_shards),
+        tons_total=donation.tons_amount
+    )
+    await session.execute(
+        counter_insert.on_conflict_do_update(
+            index_elements=[CollectedCounter.shard],
+            set_={"tons_total": func.round(CollectedCounter.tons_total + counter_insert.excluded.tons_total, 2)}
+        )
+    )
+    
+    referrals_tons_total = None
+    if referrer_id is not None:
+        # The row exists since attach_referral; the insert branch only covers rows lost to a manual fix-up
+        referrer_insert = dialect_insert(session, ReferrerTotal).values(
+            referrer_id=referrer_id,
+            referrals_count=0,
+            referrals_tons_total=donation.tons_amount
+        )
+        referrals_tons_total = (await session.execute(
+            referrer_insert.on_conflict_do_update(
+                index_elements=[ReferrerTotal.referrer_id],
+                set_={
+                    "referrals_tons_total": func.round(
+                        ReferrerTotal.referrals_tons_total + referrer_insert.excluded.referrals_tons_total, 2
+                    )
+                }
+            ).returning(ReferrerTotal.referrals_tons_total)
+        )).scalar_one()
+        await referral_tree_service.add_donation(session, donation.tg_id, donation.tons_amount)
+    
+    return DonationTotals(
+        tg_id=donation.tg_id,
+        week_key=donation.week_key,
+        tons_amount=Decimal(str(donation.tons_amount)),
+        tons_all_time=tons_all_time,
+        tons_week=tons_week,
+        first_of_week=Decimal(str(tons_week)) == Decimal(str(donation.tons_amount)).quantize(Decimal("0.01")),
+        referrer_id=referrer_id,
+        referrals_tons_total=referrals_tons_total
+    )
+
+
+async def attach_referral(
+    session: AsyncSession,
+    tg_id: int,
+    referrer_id: int,
+    tons_all_time=0
+) -> Tuple[int, Decimal]:
+    """
+    Count a user newly attached to `referrer_id` (with their current all-time total),
+    in the referrer's direct totals and in the multi-level referral tree.
+    Runs in the caller's transaction, together with setting User.referrer_id.
+    Returns the referrer's new (referrals_count, referrals_tons_total).
+    """
+    referrer_insert = dialect_insert(session, ReferrerTotal).values(
+        referrer_id=referrer_id,
+        referrals_count=1,
+        referrals_tons_total=tons_all_time
+    )
+    row = (await session.execute(
+        referrer_insert.on_conflict_do_update(
+            index_elements=[ReferrerTotal.referrer_id],
+            set_={
+                "referrals_count": ReferrerTotal.referrals_count + 1,
+                "referrals_tons_total": func.round(
+                    ReferrerTotal.referrals_tons_total + referrer_insert.excluded.referrals_tons_total, 2
+                )
+            }
+        ).returning(ReferrerTotal.referrals_count, ReferrerTotal.referrals_tons_total)
+    )).one()
+    await referral_tree_service.attach(session, tg_id, referrer_id, tons_all_time)
+    return row.referrals_count, row.referrals_tons_total
+
+
+async def get_total_collected(session: AsyncSession) -> Decimal:
+    """Sum of the counter shards (N rows instead of the whole donations table)"""
+    query = select(func.coalesce(func.sum(CollectedCounter.tons_total), 0))
+    return Decimal(str((await session.execute(query)).scalar() or 0)).quantize(Decimal("0.01"))
+
+
+async def reconcile_collected(session: AsyncSession) -> Decimal:
+    """Compare the counter with SUM(donations); returns counter - actual (0 when in sync)"""
+    actual = (await session.execute(
+        select(func.coalesce(func.sum(Donation.tons_amount), 0))
+    )).scalar() or 0
+    return await get_total_collected(session) - Decimal(str(actual)).quantize(Decimal("0.01"))
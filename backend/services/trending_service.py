@@ -0,0 +1,68 @@
+"""
+"Trending" board: every donation weighs amount * 2^(-age / half_life).
+
+Scores are kept as log2 of the sum relative to a fixed epoch,
+    log_score = log2(sum(amount_i * 2^((t_i - EPOCH) / half_life)))
+so all users decay at the same rate and their order never changes with time:
+a donation is one logaddexp on its user's row, with no periodic recompute.
+The decayed value at `now` is 2^(log_score - (now - EPOCH) / half_life).
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from datetime import datetime
+from typing import Optional
+from backend.database import dialect_insert
+from backend.config import settings
+from backend.models import Donation, User, UserTrending
+import math
+
+EPOCH = datetime(2026, 1, 1)
+
+
+def _elapsed_half_lives(dt: datetime) -> float:
+    return (dt - EPOCH).total_seconds() / (settings.trending_half_life_hours * 3600)
+
+
+def _logaddexp2(a: float, b: float) -> float:
+    """log2(2^a + 2^b) without overflow"""
+    if a < b:
+        a, b = b, a
+    return a + math.log2(1 + 2 ** (b - a))
+
+
+def decayed_score(log_score: float, now: Optional[datetime] = None) -> float:
+    """Trending score at `now` (sum of decayed donation amounts)"""
+    if now is None:
+        now = datetime.utcnow()
+    return 2 ** (log_score - _elapsed_half_lives(now))
+
+
+async def record_donation(session: AsyncSession, donation: Donation) -> None:
+    """Add a donation to its user's trending score (caller's transaction)"""
+    if donation.tons_amount is None or float(donation.tons_amount) <= 0:
+        return
+    
+    # Serialize concurrent donations of the same user (read-modify-write below)
+    await session.execute(select(User.tg_id).where(User.tg_id == donation.tg_id).with_for_update())
+    current = (await session.execute(
+        select(UserTrending.log_score).where(UserTrending.tg_id == donation.tg_id)
+    )).scalar_one_or_none()
+    
+    log_score = math.log2(float(donation.tons_amount)) + _elapsed_half_lives(donation.created_at)
+    if current is not None:
+        log_score = _logaddexp2(current, log_score)
+    
+    trending_insert = dialect_insert(session, UserTrending).values(
+        tg_id=donation.tg_id,
+        log_score=log_score,
+        updated_at=donation.created_at
+    )
+    await session.execute(
+        trending_insert.on_conflict_do_update(
+            index_elements=[UserTrending.tg_id],
+            set_={
+                "log_score": trending_insert.excluded.log_score,
+                "updated_at": trending_insert.excluded.updated_at
+            }
+        )
+    )
@@ -1,14 +1,17 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func, literal_column
 from datetime import datetime
 from typing import Optional
+from backend.database import dialect_insert
 from backend.models import User
 from backend.telegram_auth import extract_ref_code
+from backend.services import leaderboard_events, totals_service
+from backend.services.user_touch_buffer import user_touches, TOUCH_FIELDS
+from backend.services.known_users import known_users
 import logging
 
 logger = logging.getLogger(__name__)
 
-
 async def get_or_create_user(
     session: AsyncSession,
     tg_id: int,
@@ -18,56 +21,105 @@ async def get_or_create_user(
     language_code: Optional[str] = None,
     is_premium: Optional[bool] = None,
     photo_url: Optional[str] = None,
-    init_data: Optional[str] = None
+    init_data: Optional[str] = None,
+    ref_code: Optional[int] = None
 ) -> tuple[User, bool]:
     """
     Get or create user. Returns (user, is_new).
-    If user is new and init_data contains ref_code, attach referrer.
+    If user is new and init_data contains ref_code (or ref_code is given), attach referrer.
     """
-    result = await session.execute(select(User).where(User.tg_id == tg_id))
-    user = result.scalar_one_or_none()
+    user = None
+    if known_users.might_exist(tg_id):
+        result = await session.execute(select(User).where(User.tg_id == tg_id))
+        user = result.scalar_one_or_none()
     
-    is_new = False
-    if user is None:
-        # New user - check for referrer
-        referrer_id = None
-        if init_data:
-            ref_code = extract_ref_code(init_data)
-            if ref_code and ref_code != tg_id:
-                # Verify referrer exists
-                ref_result = await session.execute(select(User).where(User.tg_id == ref_code))
-                if ref_result.scalar_one_or_none():
-                    referrer_id = ref_code
-                    logger.info(f"New user {tg_id} attached to referrer {ref_code}")
-        
-        user = User(
-            tg_id=tg_id,
+    if user is not None:
+        # Existing user: refresh Telegram fields and last_seen_at via the write-behind buffer
+        user_touches.touch(
+            user,
             username=username,
             first_name=first_name,
             last_name=last_name,
             language_code=language_code,
             is_premium=is_premium,
-            photo_url=photo_url,
-            referrer_id=referrer_id,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow(),
-            last_seen_at=datetime.utcnow()
+            photo_url=photo_url
         )
-        session.add(user)
-        is_new = True
+        return user, False
+    
+    # New user - check for referrer
+    if ref_code is None and init_data:
+        ref_code = extract_ref_code(init_data)
+    referrer_id = None
+    if ref_code and ref_code != tg_id:
+        # NULL unless the referrer exists; checked by the INSERT itself
+        referrer_id = select(User.tg_id).where(User.tg_id == ref_code).scalar_subquery()
+    
+    now = datetime.utcnow()
+    user_insert = dialect_insert(session, User).values(
+        tg_id=tg_id,
+        username=username,
+        first_name=first_name,
+        last_name=last_name,
+        language_code=language_code,
+        is_premium=is_premium,
+        photo_url=photo_url or None,
+        referrer_id=referrer_id,
+        created_at=now,
+        updated_at=now,
+        last_seen_at=now
+    )
+    if session.get_bind().dialect.name == "postgresql":
+        # One statement creates the user, or - if a concurrent request (or the other
+        # process) won the race - refreshes it like a returning visit.
+        # xmax is 0 only in a freshly inserted row version.
+        user_upsert = user_insert.on_conflict_do_update(
+            index_elements=[User.tg_id],
+            set_={
+                **{
+                    key: func.coalesce(getattr(user_insert.excluded, key), getattr(User, key))
+                    for key in TOUCH_FIELDS
+                },
+                "updated_at": user_insert.excluded.updated_at,
+                "last_seen_at": user_insert.excluded.last_seen_at
+            }
+        ).returning(User, literal_column("(xmax = 0)").label("inserted"))
+        user, is_new = (await session.execute(
+            user_upsert,
+            execution_options={"populate_existing": True}
+        )).one()
     else:
-        # Update existing user data
-        user.username = username or user.username
-        user.first_name = first_name or user.first_name
-        user.last_name = last_name or user.last_name
-        user.language_code = language_code or user.language_code
-        user.is_premium = is_premium if is_premium is not None else user.is_premium
-        if photo_url:  # Update photo only if provided
-            user.photo_url = photo_url
-        user.updated_at = datetime.utcnow()
-        user.last_seen_at = datetime.utcnow()
+        # SQLite has no xmax: a row comes back only if this statement inserted it
+        user_insert = user_insert.on_conflict_do_nothing(index_elements=[User.tg_id]).returning(User)
+        user = (await session.execute(
+            user_insert,
+            execution_options={"populate_existing": True}
+        )).scalar_one_or_none()
+        is_new = user is not None
+        if not is_new:
+            # Lost the race: load the winner's row and refresh it like a returning visit
+            result = await session.execute(select(User).where(User.tg_id == tg_id))
+            user = result.scalar_one()
+            user_touches.touch(
+                user,
+                username=username,
+                first_name=first_name,
+                last_name=last_name,
+                language_code=language_code,
+                is_premium=is_premium,
+                photo_url=photo_url
+            )
+    
+    referral = None
+    if is_new and user.referrer_id is not None:
+        logger.info(f"New user {tg_id} attached to referrer {user.referrer_id}")
+        referral = await totals_service.attach_referral(session, tg_id, user.referrer_id)
     
     await session.commit()
-    await session.refresh(user)
+    known_users.add(tg_id)
+    
+    if is_new:
+        leaderboard_events.user_created(tg_id)
+    if referral is not None:
+        leaderboard_events.referral_attached(user.referrer_id, *referral)
+    
     return user, is_new
-
@@ -0,0 +1,129 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update, bindparam, func
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import datetime
+from typing import Dict, Optional
+from backend.config import settings
+from backend.database import AsyncSessionLocal
+from backend.models import User
+from backend.services.profile_cache import profile_cache
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Telegram profile fields refreshed on every visit; None keeps the stored value
+TOUCH_FIELDS = ("username", "first_name", "last_name", "language_code", "is_premium", "photo_url")
+
+
+class UserTouchBuffer:
+    """
+    Write-behind buffer for returning users' last_seen_at and Telegram profile fields.
+
+    get_or_create_user used to UPDATE + COMMIT the users row on every /me, invoice,
+    activation and inline query. Touches are now merged per user in memory and
+    written as one batched UPDATE every settings.user_touch_flush_seconds.
+    The flush loop starts with the first touch (the bot may run without the API).
+    """
+
+    def __init__(self):
+        self._pending: Dict[int, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def touch(self, user: User, **fields) -> None:
+        """
+        Apply fresh Telegram fields to `user` without marking it dirty and queue the write.
+        Fields passed as None (or an empty photo_url) keep the stored value.
+        """
+        now = datetime.utcnow()
+        values = {key: fields.get(key) or None for key in TOUCH_FIELDS}
+        values["is_premium"] = fields.get("is_premium")
+        
+        profile_changed = False
+        for key, value in values.items():
+            if value is not None and value != getattr(user, key):
+                set_committed_value(user, key, value)
+                profile_changed = True
+        set_committed_value(user, "updated_at", now)
+        set_committed_value(user, "last_seen_at", now)
+        
+        entry = self._pending.setdefault(user.tg_id, {"profile_changed": False})
+        for key, value in values.items():
+            if value is not None or key not in entry:
+                entry[key] = value
+        entry["seen_at"] = now
+        entry["profile_changed"] |= profile_changed
+        self._ensure_started()
+
+    async def flush(self, session: AsyncSession) -> int:
+        """Write all pending touches in one executemany UPDATE; returns number of users written"""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        
+        users = User.__table__
+        statement = (
+            update(users)
+            .where(users.c.tg_id == bindparam("b_tg_id"))
+            .values(
+                updated_at=bindparam("b_seen_at"),
+                last_seen_at=bindparam("b_seen_at"),
+                **{key: func.coalesce(bindparam(f"b_{key}"), users.c[key]) for key in TOUCH_FIELDS}
+            )
+        )
+        params = [
+            {"b_tg_id": tg_id, **{f"b_{key}": value for key, value in entry.items() if key != "profile_changed"}}
+            for tg_id, entry in pending.items()
+        ]
+        try:
+            await session.execute(statement, params)
+            await session.commit()
+        except Exception:
+            # Keep the touches for the next flush; newer ones win
+            for tg_id, entry in pending.items():
+                newer = self._pending.get(tg_id)
+                if newer is not None:
+                    entry.update({key: value for key, value in newer.items() if value is not None})
+                    entry["profile_changed"] |= newer["profile_changed"]
+                self._pending[tg_id] = entry
+            raise
+        
+        # Telegram name/photo changed: leaderboard rows must reload the profile
+        for tg_id, entry in pending.items():
+            if entry["profile_changed"]:
+                profile_cache.invalidate(tg_id)
+        return len(pending)
+
+    async def close(self) -> None:
+        """Stop the flush loop and write what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        async with AsyncSessionLocal() as session:
+            await self.flush(session)
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.user_touch_flush_seconds)
+            try:
+                async with AsyncSessionLocal() as session:
+                    written = await self.flush(session)
+                if written:
+                    logger.debug(f"Flushed last_seen for {written} users")
+            except Exception as e:
+                logger.error(f"Error flushing user touches: {e}")
+
+
+# Global instance
+user_touches = UserTouchBuffer()
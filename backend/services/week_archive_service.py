@@ -0,0 +1,149 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, desc, insert
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Sequence, Set
+from backend.models import User, UserWeekTotal, WeekArchive, WeekSnapshot
+from backend.services.leaderboard_service import get_week_key, Cursor
+from backend.services.profile_cache import PROFILE_FIELDS
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A week is frozen only after this much time into the next one, so donations
+# stamped with the old week_key right before rollover have committed.
+CLOSE_GRACE = timedelta(minutes=10)
+
+# Archived weeks never change, so membership can be memoized
+_archived_weeks: Set[str] = set()
+
+
+async def is_archived(session: AsyncSession, week_key: str) -> bool:
+    if week_key in _archived_weeks:
+        return True
+    found = (await session.execute(
+        select(WeekArchive.week_key).where(WeekArchive.week_key == week_key)
+    )).scalar_one_or_none()
+    if found:
+        _archived_weeks.add(week_key)
+    return found is not None
+
+
+async def freeze_week(session: AsyncSession, week_key: str) -> int:
+    """Copy the final standings of a closed week into week_snapshots. Returns participants."""
+    query = (
+        select(
+            UserWeekTotal.tg_id,
+            UserWeekTotal.tons,
+            User.username,
+            User.first_name,
+            User.display_name,
+            User.photo_url,
+            User.custom_title,
+            User.custom_text,
+            User.custom_link
+        )
+        .join(User, User.tg_id == UserWeekTotal.tg_id)
+        .where(UserWeekTotal.week_key == week_key)
+        .where(UserWeekTotal.tons > 0)
+        .where(User.is_blocked == False)
+        .order_by(desc(UserWeekTotal.tons), UserWeekTotal.tg_id)
+    )
+    rows = (await session.execute(query)).all()
+    
+    if rows:
+        await session.execute(insert(WeekSnapshot), [
+            {
+                "week_key": week_key,
+                "rank": rank,
+                "tg_id": row.tg_id,
+                "tons_week": row.tons,
+                "username": row.username,
+                "first_name": row.first_name,
+                "display_name": row.display_name,
+                "photo_url": row.photo_url,
+                "custom_title": row.custom_title,
+                "custom_text": row.custom_text,
+                "custom_link": row.custom_link
+            }
+            for rank, row in enumerate(rows, start=1)
+        ])
+    session.add(WeekArchive(week_key=week_key, participants=len(rows), frozen_at=datetime.utcnow()))
+    await session.commit()
+    
+    _archived_weeks.add(week_key)
+    logger.info(f"Week {week_key} frozen: {len(rows)} participants")
+    return len(rows)
+
+
+async def freeze_closed_weeks(session: AsyncSession) -> List[str]:
+    """Freeze every ended week (per get_week_key / settings.timezone) not archived yet"""
+    open_week = get_week_key(datetime.utcnow() - CLOSE_GRACE)
+    current_week = get_week_key()
+    archived = select(WeekArchive.week_key)
+    query = (
+        select(UserWeekTotal.week_key)
+        .where(UserWeekTotal.week_key < open_week)
+        .where(UserWeekTotal.week_key < current_week)
+        .where(UserWeekTotal.week_key.not_in(archived))
+        .distinct()
+        .order_by(UserWeekTotal.week_key)
+    )
+    week_keys = (await session.execute(query)).scalars().all()
+    for week_key in week_keys:
+        await freeze_week(session, week_key)
+    return list(week_keys)
+
+
+async def get_archived_week_leaderboard(
+    session: AsyncSession,
+    week_key: str,
+    limit: int = 50,
+    offset: int = 0,
+    after: Optional[Cursor] = None,
+    fields: Sequence[str] = PROFILE_FIELDS
+) -> List[Dict]:
+    """Page of a frozen week, read by primary key (week_key, rank)"""
+    start_rank = after.rank if after is not None else offset
+    query = (
+        select(WeekSnapshot)
+        .where(WeekSnapshot.week_key == week_key)
+        .where(WeekSnapshot.rank > start_rank)
+        .order_by(WeekSnapshot.rank)
+        .limit(limit)
+    )
+    rows = (await session.execute(query)).scalars().all()
+    return [_snapshot_row(row, fields) for row in rows]
+
+
+async def list_archived_weeks(session: AsyncSession) -> List[Dict]:
+    """Archived weeks, newest first, with their winners"""
+    query = (
+        select(WeekArchive, WeekSnapshot)
+        .outerjoin(
+            WeekSnapshot,
+            (WeekSnapshot.week_key == WeekArchive.week_key) & (WeekSnapshot.rank == 1)
+        )
+        .order_by(desc(WeekArchive.week_key))
+    )
+    result = await session.execute(query)
+    
+    weeks = []
+    for archive, winner in result.all():
+        weeks.append({
+            "week_key": archive.week_key,
+            "participants": archive.participants,
+            "frozen_at": archive.frozen_at.isoformat(),
+            "winner": _snapshot_row(winner) if winner else None
+        })
+    return weeks
+
+
+def _snapshot_row(row: WeekSnapshot, fields: Sequence[str] = PROFILE_FIELDS) -> Dict:
+    profile = {field: getattr(row, field) for field in PROFILE_FIELDS}
+    profile["has_details"] = bool(row.custom_text or row.custom_link)
+    return {
+        "rank": row.rank,
+        "tg_id": row.tg_id,
+        **{field: profile[field] for field in fields},
+        "tons_week": float(row.tons_week)
+    }
@@ -1,19 +1,87 @@
 import hmac
 import hashlib
 import json
+import time
 import urllib.parse
-from typing import Optional, Dict
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Dict, Tuple
 from backend.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=4)
+def _webapp_secret(bot_token: str) -> bytes:
+    """HMAC key for initData hashes; derived once per bot token"""
+    return hmac.new(
+        key=b"WebAppData",
+        msg=bot_token.encode(),
+        digestmod=hashlib.sha256
+    ).digest()
+
+
+class InitDataCache:
+    """
+    Verified initData -> user dict (LRU with TTL).
+    The mini app sends the same X-Init-Data on every request of a session, so
+    parsing and HMAC verification happen once per session instead of per request.
+    Keyed by a digest of the raw string; entries never outlive auth_date expiry.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict]]" = OrderedDict()
+
+    def get(self, key: bytes) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() >= entry[0]:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: bytes, user: Dict, expires_at: float) -> None:
+        self._entries[key] = (expires_at, user)
+        self._entries.move_to_end(key)
+        while len(self._entries) > settings.init_data_cache_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# Global instance
+init_data_cache = InitDataCache()
+
+
 def validate_telegram_init_data(init_data: str) -> Optional[Dict]:
     """
     Validate Telegram Web App initData and extract user info.
     Returns dict with user data if valid, None otherwise.
+    Successful validations are cached (see InitDataCache).
     """
+    key = hashlib.sha256(init_data.encode()).digest()
+    user = init_data_cache.get(key)
+    if user is not None:
+        return dict(user)
+    
+    result = _verify_init_data(init_data)
+    if result is None:
+        return None
+    user, auth_date = result
+    
+    expires_at = time.time() + settings.init_data_cache_ttl_seconds
+    if settings.init_data_max_age_seconds > 0:
+        expires_at = min(expires_at, auth_date + settings.init_data_max_age_seconds)
+    init_data_cache.put(key, user, expires_at)
+    return dict(user)
+
+
+def _verify_init_data(init_data: str) -> Optional[Tuple[Dict, int]]:
+    """Parse and verify initData; returns (user dict, auth_date) or None"""
     try:
         # Parse init_data
         params = dict(urllib.parse.parse_qsl(init_data))
@@ -27,25 +95,24 @@ def validate_telegram_init_data(init_data: str) -> Optional[Dict]:
         # Create data check string
         data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(params.items()))
         
-        # Calculate secret key (bot token)
-        secret_key = hmac.new(
-            key=b"WebAppData",
-            msg=settings.bot_token.encode(),
-            digestmod=hashlib.sha256
-        ).digest()
-        
         # Calculate hash
         calculated_hash = hmac.new(
-            key=secret_key,
+            key=_webapp_secret(settings.bot_token),
             msg=data_check_string.encode(),
             digestmod=hashlib.sha256
         ).hexdigest()
         
         # Verify hash
-        if calculated_hash != received_hash:
+        if not hmac.compare_digest(calculated_hash, received_hash):
             logger.warning("Invalid init_data hash")
             return None
         
+        # Optionally reject initData older than init_data_max_age_seconds
+        auth_date = int(params.get("auth_date", 0))
+        if settings.init_data_max_age_seconds > 0 and time.time() - auth_date > settings.init_data_max_age_seconds:
+            logger.warning("Expired init_data")
+            return None
+        
         # Parse user data
         if "user" in params:
             user_data = json.loads(params["user"])
@@ -57,7 +124,7 @@ def validate_telegram_init_data(init_data: str) -> Optional[Dict]:
                 "language_code": user_data.get("language_code"),
                 "is_premium": user_data.get("is_premium"),
                 "photo_url": user_data.get("photo_url"),
-            }
+            }, auth_date
         
         return None
     except Exception as e:
@@ -798,32 +798,61 @@ async function claimTaskReward(taskId) {
     }
 }
 
-// Load leaderboard
+// Loaded leaderboard pages per tab: { items, nextCursor }
+let leaderboardPages = {};
+
+// Fields the list needs; description and link are loaded by the profile modal
+const LEADERBOARD_LIST_FIELDS = 'username,first_name,display_name,photo_url,custom_title,has_details';
+
+async function fetchLeaderboardPage(type, cursor) {
+    let url = `${API_BASE_URL}/leaderboard/${type}?fields=${LEADERBOARD_LIST_FIELDS}`;
+    if (cursor) {
+        url += `&cursor=${encodeURIComponent(cursor)}`;
+    }
+    const response = await fetch(url, {
+        headers: {
+            'X-Init-Data': initData
+        }
+    });
+    
+    if (!response.ok) {
+        throw new Error('Failed to load leaderboard');
+    }
+    
+    return response.json();
+}
+
+// Load leaderboard (first page)
 async function loadLeaderboard(type) {
     const listElement = document.getElementById(`${type}-list`);
     if (!listElement) return;
     listElement.innerHTML = `<div class="loading">${t('loading')}</div>`;
     
     try {
-        const url = `${API_BASE_URL}/leaderboard/${type}?limit=10000`;
-        const response = await fetch(url, {
-            headers: {
-                'X-Init-Data': initData
-            }
-        });
-        
-        if (!response.ok) {
-            throw new Error('Failed to load leaderboard');
-        }
-        
-        const data = await response.json();
-        renderLeaderboard(type, data);
+        const data = await fetchLeaderboardPage(type, null);
+        leaderboardPages[type] = { items: data.items, nextCursor: data.next_cursor };
+        renderLeaderboard(type, data.items);
     } catch (error) {
         console.error('Load leaderboard error:', error);
         listElement.innerHTML = `<div class="loading">${t('errorLoading')}</div>`;
     }
 }
 
+// Load next leaderboard page and append it
+async function loadMoreLeaderboard(type) {
+    const page = leaderboardPages[type];
+    if (!page || !page.nextCursor) return;
+    
+    try {
+        const data = await fetchLeaderboardPage(type, page.nextCursor);
+        page.items = page.items.concat(data.items);
+        page.nextCursor = data.next_cursor;
+        renderLeaderboard(type, page.items);
+    } catch (error) {
+        console.error('Load more leaderboard error:', error);
+    }
+}
+
 // Render leaderboard
 // Store leaderboard data for user profiles
 let leaderboardData = {};
@@ -882,10 +911,9 @@ function renderLeaderboard(type, items) {
         // Show title in leaderboard list (link icon if has link/description)
         let customInfo = '';
         if (item.custom_title) {
-            const hasMore = item.custom_text || item.custom_link;
-            const moreIcon = hasMore ? ' →' : '';
+            const moreIcon = item.has_details ? ' →' : '';
             customInfo = `<div class="user-custom-text"><span class="user-custom-text-inner">${escapeHtml(item.custom_title)}${moreIcon}</span></div>`;
-        } else if (item.custom_text || item.custom_link) {
+        } else if (item.has_details) {
             customInfo = `<div class="user-custom-text"><span class="user-custom-text-inner">🔗</span></div>`;
         }
         
@@ -927,6 +955,11 @@ function renderLeaderboard(type, items) {
         `;
     });
     
+    const page = leaderboardPages[type];
+    if (page && page.nextCursor) {
+        html += `<button class="load-more-btn" onclick="loadMoreLeaderboard('${type}')">${t('loadMore')}</button>`;
+    }
+    
     listElement.innerHTML = html;
     
     // Show my position (charts count depends on current tab: all-time / week / referrals)
@@ -1303,38 +1336,8 @@ function selectPaymentMethod(method) {
     selectedPaymentMethod = 'stars';
 }
 
-// Open user profile modal
-function openUserProfile(tgId, rank) {
-    haptic.impact('light');
-    
-    const user = leaderboardData[tgId];
-    if (!user) return;
-    
-    const modal = document.getElementById('user-profile-modal');
-    const backdrop = document.getElementById('user-profile-backdrop');
-    
-    // Set avatar
-    const avatarEl = document.getElementById('user-profile-avatar');
-    if (user.photo_url) {
-        avatarEl.innerHTML = `<img src="${user.photo_url}" alt="">`;
-    } else {
-        const initial = (user.first_name || user.username || 'U')[0].toUpperCase();
-        avatarEl.innerHTML = `<span>${initial}</span>`;
-    }
-    
-    // Set name (prefer display_name if set)
-    const nameEl = document.getElementById('user-profile-name');
-    nameEl.textContent = user.display_name || user.first_name || user.username || 'User';
-    
-    // Set username
-    const usernameEl = document.getElementById('user-profile-username');
-    usernameEl.textContent = user.username ? `@${user.username}` : '';
-    usernameEl.style.display = user.username ? 'block' : 'none';
-    
-    // Set stats
-    document.getElementById('user-profile-tons').textContent = user._displayTons || user.tons_total || 0;
-    document.getElementById('user-profile-rank').textContent = `#${rank}`;
-    
+// Description and link in the profile modal
+function renderUserProfileDetails(user) {
     // Set custom title and description
     const customTextEl = document.getElementById('user-profile-custom-text');
     let profileText = '';
@@ -1376,6 +1379,62 @@ function openUserProfile(tgId, rank) {
     } else if (linkEl) {
         linkEl.style.display = 'none';
     }
+}
+
+// Leaderboard rows carry only list fields; fetch description and link on open
+async function loadUserProfileDetails(user) {
+    try {
+        const response = await fetch(`${API_BASE_URL}/users/${user.tg_id}/profile`, {
+            headers: {
+                'X-Init-Data': initData
+            }
+        });
+        if (!response.ok) return;
+        const profile = await response.json();
+        user.custom_text = profile.custom_text;
+        user.custom_link = profile.custom_link;
+        renderUserProfileDetails(user);
+    } catch (error) {
+        console.error('Error loading profile:', error);
+    }
+}
+
+// Open user profile modal
+function openUserProfile(tgId, rank) {
+    haptic.impact('light');
+    
+    const user = leaderboardData[tgId];
+    if (!user) return;
+    
+    const modal = document.getElementById('user-profile-modal');
+    const backdrop = document.getElementById('user-profile-backdrop');
+    
+    // Set avatar
+    const avatarEl = document.getElementById('user-profile-avatar');
+    if (user.photo_url) {
+        avatarEl.innerHTML = `<img src="${user.photo_url}" alt="">`;
+    } else {
+        const initial = (user.first_name || user.username || 'U')[0].toUpperCase();
+        avatarEl.innerHTML = `<span>${initial}</span>`;
+    }
+    
+    // Set name (prefer display_name if set)
+    const nameEl = document.getElementById('user-profile-name');
+    nameEl.textContent = user.display_name || user.first_name || user.username || 'User';
+    
+    // Set username
+    const usernameEl = document.getElementById('user-profile-username');
+    usernameEl.textContent = user.username ? `@${user.username}` : '';
+    usernameEl.style.display = user.username ? 'block' : 'none';
+    
+    // Set stats
+    document.getElementById('user-profile-tons').textContent = user._displayTons || user.tons_total || 0;
+    document.getElementById('user-profile-rank').textContent = `#${rank}`;
+    
+    renderUserProfileDetails(user);
+    if (user.has_details && user.custom_text === undefined) {
+        loadUserProfileDetails(user);
+    }
     
     // "Take their place" button: only for other users, suggests deposit +1 charts
     const takePlaceBtn = document.getElementById('take-place-btn');
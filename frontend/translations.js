@@ -70,6 +70,7 @@ const translations = {
         // Messages
         loading: "Загрузка...",
         noData: "Нет данных",
+        loadMore: "Показать ещё",
         errorLoading: "Ошибка загрузки",
         you: "Вы",
         yourPosition: "Место в топе",
@@ -254,6 +255,7 @@ const translations = {
         // Messages
         loading: "Loading...",
         noData: "No data",
+        loadMore: "Show more",
         errorLoading: "Error loading",
         you: "You",
         yourPosition: "Place in top",
@@ -5,6 +5,9 @@ Run Telegram bot with polling (for development)
 import asyncio
 import logging
 from backend.bot import bot, dp
+from backend.database import AsyncSessionLocal
+from backend.services.user_touch_buffer import user_touches
+from backend.services.known_users import known_users
 from backend.config import settings
 
 logging.basicConfig(
@@ -30,11 +33,15 @@ async def main():
         bot_info = await bot.get_me()
         logger.info(f"Bot started: @{bot_info.username} ({bot_info.first_name})")
         
+        async with AsyncSessionLocal() as session:
+            await known_users.load(session)
+        
         # Start polling
         await dp.start_polling(bot)
     except Exception as e:
         logger.error(f"Error starting bot: {e}", exc_info=True)
     finally:
+        await user_touches.close()
         await bot.session.close()
 
 